@@ -0,0 +1,111 @@
+"""Asyncio interface to the Dialogflow management API.
+
+Requests are sent by an :class:`api_ai.api.ApiAi` client, sharing its pooled
+session, retries and latency stats, from a thread pool. A semaphore bounds the
+number of requests in flight, so hundreds of calls can be gathered at once
+while staying under the API quota.
+
+Example usage:
+
+    async def rename_intents(api):
+        intents = await api.agent_intents()
+        await asyncio.gather(*[api.put_intent(i.id, rename(i)) for i in intents])
+
+    async with AsyncApiAi(max_concurrency=20) as api:
+        await rename_intents(api)
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from .api import ApiAi
+
+
+class AsyncApiAi(object):
+    """Asyncio variant of :class:`api_ai.api.ApiAi`.
+
+    Keyword Arguments:
+        api {ApiAi} -- client sending the requests (default: {None}, a new ApiAi
+                       with a connection pool of max_concurrency)
+        max_concurrency {int} -- maximum number of requests in flight (default: {10})
+
+    Other keyword arguments are passed to the new :class:`ApiAi` client.
+    """
+
+    def __init__(self, api=None, max_concurrency=10, **kwargs):
+        if api is None:
+            kwargs.setdefault("pool_size", max_concurrency)
+            api = ApiAi(**kwargs)
+        self.api = api
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_concurrency)
+        # created on first use, as semaphores bind to the running loop on python < 3.10
+        self._semaphore = None
+
+    async def _call(self, func, *args):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        loop = asyncio.get_event_loop()
+        async with self._semaphore:
+            return await loop.run_in_executor(self._executor, partial(func, *args))
+
+    @property
+    def stats(self):
+        """Latency of the requests sent, per endpoint, see :attr:`ApiAi.stats`"""
+        return self.api.stats
+
+    def close(self):
+        """Waits for the requests in flight and stops the thread pool"""
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    ## Intents ##
+
+    async def agent_intents(self):
+        """Returns a list of the agent's intents as Intent objects"""
+        return await self._call(lambda: self.api.agent_intents)
+
+    async def get_intent(self, intent_id):
+        """Returns the intent json of the given intent_id"""
+        return await self._call(self.api.get_intent, intent_id)
+
+    async def post_intent(self, intent_json):
+        """Sends post request to create a new intent"""
+        return await self._call(self.api.post_intent, intent_json)
+
+    async def put_intent(self, intent_id, intent_json):
+        """Send a put request to update the intent with intent_id"""
+        return await self._call(self.api.put_intent, intent_id, intent_json)
+
+    async def delete_intent(self, intent_id):
+        """Send a delete request to remove the intent with intent_id"""
+        return await self._call(self.api.delete_intent, intent_id)
+
+    ## Entities ##
+
+    async def agent_entities(self):
+        """Returns a list of the agent's entities as Entity objects"""
+        return await self._call(lambda: self.api.agent_entities)
+
+    async def get_entity(self, entity_id):
+        return await self._call(self.api.get_entity, entity_id)
+
+    async def post_entity(self, entity_json):
+        return await self._call(self.api.post_entity, entity_json)
+
+    async def put_entity(self, entity_id, entity_json):
+        return await self._call(self.api.put_entity, entity_id, entity_json)
+
+    async def delete_entity(self, entity_id):
+        return await self._call(self.api.delete_entity, entity_id)
+
+    ## Querying ##
+
+    async def post_query(self, query, sessionID=None):
+        return await self._call(self.api.post_query, query, sessionID)
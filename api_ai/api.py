@@ -1,23 +1,164 @@
 import os
+import threading
+import time
 import requests
 import json
 
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 from . import logger
 from .models import Intent, Entity
 
+DEFAULT_BASE_URL = "https://dialogflow.googleapis.com/v2/"
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (5, 30)
+
+
+class _Retry(Retry):
+    """Retries idempotent requests on server errors, and any request refused with 429 or 503.
+
+    A refused request was not processed, so retrying it cannot create an intent or
+    entity twice. The Retry-After header of the refusal is honored.
+    """
+
+    REFUSED_STATUSES = frozenset([429, 503])
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if status_code in self.REFUSED_STATUSES and self.total:
+            return True
+        return super(_Retry, self).is_retry(method, status_code, has_retry_after)
+
 
 class ApiAi(object):
     """Interface for making and recieving API-AI requests.
 
     Use the developer access token for managing entities and intents and the client access token for making queries.
 
+    Requests share a connection-pooled session. Failed requests are retried with
+    exponential backoff: GET and PUT requests on 429 and 5xx responses, POST
+    requests only on 429 and 503, which the API sends before processing them.
+
+    Keyword Arguments:
+        dev_token {str} -- Dialogflow dev access token (default: {DEV_ACCESS_TOKEN env var})
+        client_token {str} -- Dialogflow client access token (default: {CLIENT_ACCESS_TOKEN env var})
+        base_url {str} -- URL of the API, ending with a slash (default: {DEFAULT_BASE_URL})
+        pool_size {int} -- maximum number of connections kept open (default: {10})
+        timeout {float or tuple} -- connect and read timeouts in seconds (default: {(5, 30)})
+        retries {int} -- maximum number of retries of a request (default: {3})
+        backoff_factor {float} -- retries wait backoff_factor * 2 ** (retry - 1) seconds,
+                                  unless told otherwise by Retry-After (default: {0.5})
+        session {requests.Session} -- session to send requests with (default: {None}, a new one)
     """
 
-    def __init__(self, dev_token=None, client_token=None):
+    # protocol version sent as the v query parameter
+    versioning = "20150910"
+
+    def __init__(
+        self,
+        dev_token=None,
+        client_token=None,
+        base_url=None,
+        pool_size=10,
+        timeout=DEFAULT_TIMEOUT,
+        retries=3,
+        backoff_factor=0.5,
+        session=None,
+    ):
 
         self._dev_token = dev_token or os.getenv("DEV_ACCESS_TOKEN")
         self._client_token = client_token or os.getenv("CLIENT_ACCESS_TOKEN")
-        self.base_url = "https://dialogflow.googleapis.com/v2"
+        self.base_url = base_url or DEFAULT_BASE_URL
+        if not self.base_url.endswith("/"):
+            self.base_url += "/"
+        self.timeout = timeout
+
+        self.session = session or requests.Session()
+        retry = _Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size, max_retries=retry
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def stats(self):
+        """Latency of the requests sent, per endpoint.
+
+        Returns:
+            dict -- endpoints, such as "PUT intents/{id}", mapped to dicts of their
+                    number of calls, errors and retries, and mean and max latency in seconds
+        """
+        with self._stats_lock:
+            return {
+                endpoint: {
+                    "calls": s["calls"],
+                    "errors": s["errors"],
+                    "retries": s["retries"],
+                    "mean": s["total"] / s["calls"],
+                    "max": s["max"],
+                }
+                for endpoint, s in self._stats.items()
+            }
+
+    def _record(self, endpoint, elapsed, retries, error):
+        with self._stats_lock:
+            s = self._stats.get(endpoint)
+            if s is None:
+                s = self._stats[endpoint] = {
+                    "calls": 0,
+                    "errors": 0,
+                    "retries": 0,
+                    "total": 0.0,
+                    "max": 0.0,
+                }
+            s["calls"] += 1
+            s["errors"] += error
+            s["retries"] += retries
+            s["total"] += elapsed
+            s["max"] = max(s["max"], elapsed)
+
+    def _endpoint_name(self, method, url):
+        """Returns the endpoint of a request, with its resource ID replaced by {id}"""
+        path = url[len(self.base_url) :].split("?")[0].split("/")
+        if len(path) > 1:
+            path[1:] = ["{id}"]
+        return "{} {}".format(method, "/".join(path))
+
+    def _request(self, method, url, headers, data=None):
+        """Sends a request with the pooled session and returns the response.
+
+        Raises:
+            requests.HTTPError -- the final response has an error status
+            requests.RequestException -- the request could not be sent
+        """
+        endpoint = self._endpoint_name(method, url)
+        start = time.perf_counter()
+        response = None
+        try:
+            response = self.session.request(
+                method, url, headers=headers, data=data, timeout=self.timeout
+            )
+            response.raise_for_status()
+            return response
+        finally:
+            elapsed = time.perf_counter() - start
+            retry = getattr(getattr(response, "raw", None), "retries", None)
+            retries = len(retry.history) if retry is not None else 0
+            error = response is None or not response.ok
+            self._record(endpoint, elapsed, retries, error)
+            logger.debug(
+                "{} took {:.3f}s with {} retries".format(endpoint, elapsed, retries)
+            )
 
     @property
     def _dev_header(self):
@@ -56,21 +197,22 @@ class ApiAi(object):
         return "{}query?v={}".format(self.base_url, self.versioning)
 
     def _get(self, endpoint):
-        response = requests.get(endpoint, headers=self._dev_header)
-        response.raise_for_status
+        response = self._request("GET", endpoint, self._dev_header)
         logger.debug("Response from {}: {}".format(endpoint, response))
         return response.json()
 
     def _post(self, endpoint, data):
-        response = requests.post(endpoint, headers=self._dev_header, data=data)
-        response.raise_for_status
+        response = self._request("POST", endpoint, self._dev_header, data=data)
         return response.json()
 
     def _put(self, endpoint, data):
-        response = requests.put(endpoint, headers=self._dev_header, data=data)
-        response.raise_for_status
+        response = self._request("PUT", endpoint, self._dev_header, data=data)
         return response.json()
 
+    def _delete(self, endpoint):
+        response = self._request("DELETE", endpoint, self._dev_header)
+        return response.json() if response.content else {}
+
     ## Intents ##
 
     @property
@@ -98,6 +240,11 @@ class ApiAi(object):
         endpoint = self._intent_uri(intent_id)
         return self._put(endpoint, intent_json)
 
+    def delete_intent(self, intent_id):
+        """Send a delete request to remove the intent with intent_id"""
+        endpoint = self._intent_uri(intent_id)
+        return self._delete(endpoint)
+
     ## Entities ##
 
     @property
@@ -122,6 +269,10 @@ class ApiAi(object):
         endpoint = self._entity_uri(entity_id)
         return self._put(endpoint, data=entity_json)
 
+    def delete_entity(self, entity_id):
+        endpoint = self._entity_uri(entity_id)
+        return self._delete(endpoint)
+
     ## Querying ##
     def post_query(self, query, sessionID=None):
         data = {
@@ -133,8 +284,4 @@ class ApiAi(object):
 
         data = json.dumps(data)
 
-        response = requests.post(
-            self._query_uri, headers=self._client_header, data=data
-        )
-        response.raise_for_status
-        return response
+        return self._request("POST", self._query_uri, self._client_header, data=data)
@@ -18,7 +18,7 @@ raise DeprecationWarning(
 
 def file_from_args():
     try:
-        return sys.argv[1]
+        return [arg for arg in sys.argv[1:] if not arg.startswith("--")][0]
     except IndexError:
         raise IndexError("Please provide the file containing the Assistant object")
 
@@ -51,15 +51,18 @@ def entities():
 
 
 def schema():
+    """Syncs the agent's intents and entities, or prints the diff with --dry-run"""
     filename = file_from_args()
+    dry_run = "--dry-run" in sys.argv[1:]
     assist = get_assistant(filename)
     intents = IntentGenerator(assist)
     entities = EntityGenerator(assist)
     templates = TemplateCreator(assist)
 
-    templates.generate()
-    intents.generate()
-    entities.generate()
+    if not dry_run:
+        templates.generate()
+    intents.generate(dry_run=dry_run)
+    entities.generate(dry_run=dry_run)
 
 
 def check():
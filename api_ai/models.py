@@ -86,9 +86,13 @@ class Intent():
             return True
 
 
-    def add_example(self, phrase, templ_entity_map=None):  # TODO
+    def add_example(self, phrase, templ_entity_map=None, annotator=None):  # TODO
+        """Adds a UserSays example, annotated with the values of templ_entity_map.
+
+        An annotator built from templ_entity_map can be given to share it between examples.
+        """
         if templ_entity_map:
-            example = UserDefinedExample(phrase, templ_entity_map)
+            example = UserDefinedExample(phrase, templ_entity_map, annotator)
         else:
             example = AutoAnnotedExamle(phrase)
 
@@ -146,29 +150,77 @@ class AutoAnnotedExamle(ExampleBase):
         self.data.append({'text': self.text, 'userDefined': False})
 
 
+CURRENCY_PREFIXES = ('$', '¥', '￥', '€', '£')
+
+
+def _trie_pattern(node):
+    """Returns the regex of the values stored in a trie, preferring the longest"""
+    alternatives = [re.escape(char) + _trie_pattern(child)
+                    for char, child in sorted(node.items(), key=lambda item: item[0] or '')
+                    if char is not None]
+    if None in node:  # a value ends here
+        alternatives.append(r'\b')
+    if len(alternatives) == 1:
+        return alternatives[0]
+    return '(?:{})'.format('|'.join(alternatives))
+
+
+class PhraseAnnotator(object):
+    """Finds the values of an entity map in phrases, with one regex compiled from the whole map.
+
+    Values are matched as whole words, except that values starting with a currency
+    symbol may follow a word character. Values are stored in a trie turned into a
+    regex, so each position of a phrase is matched against the first characters of
+    the values rather than against every value. Where values overlap, the leftmost
+    is annotated, and the longest of those starting at the same position.
+    """
+
+    def __init__(self, entity_map):
+        self.entity_map = entity_map
+        words, currencies = {}, {}
+        for value in entity_map:
+            if not value:
+                continue
+            node = currencies if value.startswith(CURRENCY_PREFIXES) else words
+            for char in value:
+                node = node.setdefault(char, {})
+            node[None] = True
+
+        patterns = []
+        if words:
+            patterns.append(r'\b' + _trie_pattern(words))
+        if currencies:
+            patterns.append(_trie_pattern(currencies))
+        self.regex = re.compile('|'.join(patterns)) if patterns else None
+
+    def split(self, phrase):
+        """Yields the (text, is_value) parts of phrase, in a single pass"""
+        position = 0
+        if self.regex is not None:
+            for match in self.regex.finditer(phrase):
+                if match.start() > position:
+                    yield phrase[position:match.start()], False
+                yield match.group(), True
+                position = match.end()
+        if position < len(phrase):
+            yield phrase[position:], False
+
+
 class UserDefinedExample(ExampleBase):
 
-    def __init__(self, phrase, entity_map):
+    def __init__(self, phrase, entity_map, annotator=None):
         super(UserDefinedExample, self).__init__(phrase, user_defined=True)
-        # import ipdb; ipdb.set_trace()
         self.entity_map = entity_map
+        self.annotator = annotator or PhraseAnnotator(entity_map)
 
         self._parse_phrase(self.text)
 
-    def _parse_phrase(self, sub_phrase):
-        if not sub_phrase:
-            return
-
-        for value in self.entity_map:
-            re_value = r".\b{}\b".format(value[1:]) if value.startswith(('$', '¥', '￥', '€', '£')) else r"\b{}\b".format(value)
-            if re.search(re_value, sub_phrase):
-                parts = sub_phrase.split(value, 1)
-                self._parse_phrase(parts[0])
-                self._annotate_params(value)
-                self._parse_phrase(parts[1])
-                return
-
-        self.data.append({'text': sub_phrase})
+    def _parse_phrase(self, phrase):
+        for text, is_value in self.annotator.split(phrase):
+            if is_value:
+                self._annotate_params(text)
+            else:
+                self.data.append({'text': text})
 
     def _annotate_params(self, word):
         """Annotates a given word for the UserSays data field of an Intent object.
@@ -0,0 +1,129 @@
+"""Concurrent pushing of schema objects to the Dialogflow management API."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class RateLimiter(object):
+    """Token bucket limiting the rate of requests sent by several threads.
+
+    Arguments:
+        rate {float} -- requests allowed per second, on average
+
+    Keyword Arguments:
+        burst {int} -- requests that can be sent at once after a pause (default: {rate, at least 1})
+    """
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.burst = burst or max(1, int(rate))
+        self.waited = 0.0
+        self._tokens = float(self.burst)
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a request may be sent"""
+        while True:
+            with self._lock:
+                now = self._clock()
+                elapsed = now - self._updated
+                self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+                self.waited += wait
+            self._sleep(wait)
+
+
+class PushSummary(object):
+    """Outcome of pushing schema objects: timings, retries and failures"""
+
+    def __init__(self, object_type):
+        self.object_type = object_type
+        self.durations = []
+        self.failures = []
+        self.retries = 0
+        self.throttled = 0.0
+        self.elapsed = 0.0
+
+    @property
+    def pushed(self):
+        return len(self.durations)
+
+    def __str__(self):
+        lines = [
+            "Pushed {} {} in {:.2f}s, {} failed".format(
+                self.pushed, self.object_type, self.elapsed, len(self.failures)
+            )
+        ]
+        if self.durations:
+            lines.append(
+                "  per object: mean {:.3f}s, max {:.3f}s".format(
+                    sum(self.durations) / len(self.durations), max(self.durations)
+                )
+            )
+        lines.append(
+            "  {} retries, {:.2f}s waiting on the rate limit".format(
+                self.retries, self.throttled
+            )
+        )
+        for name, error in self.failures:
+            lines.append("  failed {}: {}".format(name, error))
+        return "\n".join(lines)
+
+
+def _total_retries(api):
+    return sum(s["retries"] for s in getattr(api, "stats", {}).values())
+
+
+def push_all(objects, push, api, object_type, workers=8, limiter=None):
+    """Pushes objects from a pool of worker threads.
+
+    Arguments:
+        objects {list} -- Intent or Entity objects with a name
+        push {callable} -- pushes an object and returns it with its ID
+        api {ApiAi} -- client the objects are pushed with, for its retry stats
+        object_type {str} -- "intents" or "entities", for the summary
+
+    Keyword Arguments:
+        workers {int} -- objects pushed at once (default: {8})
+        limiter {RateLimiter} -- rate limit shared by the workers, reported in the summary
+
+    Returns:
+        tuple -- the pushed objects in the order given, failed ones unchanged,
+                 and the :class:`PushSummary` of the push
+    """
+    summary = PushSummary(object_type)
+    retries = _total_retries(api)
+    waited = limiter.waited if limiter is not None else 0.0
+    start = time.perf_counter()
+
+    def timed_push(obj):
+        obj_start = time.perf_counter()
+        pushed = push(obj)
+        return pushed, time.perf_counter() - obj_start
+
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(timed_push, obj) for obj in objects]
+        for obj, future in zip(objects, futures):
+            try:
+                pushed, duration = future.result()
+            except Exception as e:
+                summary.failures.append((obj.name, e))
+                results.append(obj)
+            else:
+                summary.durations.append(duration)
+                results.append(pushed)
+
+    summary.elapsed = time.perf_counter() - start
+    summary.retries = _total_retries(api) - retries
+    if limiter is not None:
+        summary.throttled = limiter.waited - waited
+    return results, summary
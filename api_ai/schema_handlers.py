@@ -1,21 +1,113 @@
 import os
+import hashlib
 import inspect
 import json
+import threading
+from collections import OrderedDict, namedtuple
+import requests
 from ruamel import yaml
 
-from .models import Intent, Entity
+from .models import Intent, Entity, PhraseAnnotator
+from .push import RateLimiter, push_all
+from .store import SchemaStore
+from .templates import templates
 
 
+def _conflict_response(error):
+    """Returns the response of a request refused because its object exists, or raises error"""
+    if error.response is None or error.response.status_code != 409:
+        raise error
+    try:
+        response = error.response.json()
+    except ValueError:
+        response = None
+    if not isinstance(response, dict) or 'status' not in response:
+        response = {'status': {'code': 409}}
+    return response
+
+
+def content_hash(obj):
+    """Returns the hash of an Intent or Entity's content, ignoring its ID"""
+    content = dict((k, v) for k, v in obj.__dict__.items() if k != 'id')
+    serialized = json.dumps(content, sort_keys=True)
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+
+# an object of the saved schema that is no longer defined
+_Removed = namedtuple('_Removed', ['name', 'id'])
+
+
+class SchemaDiff(object):
+    """Objects added, changed, deleted and unchanged since the schema was saved.
+
+    Attributes:
+        summary {PushSummary} -- outcome of pushing the diff, None for a dry run
+    """
+
+    def __init__(self, object_type):
+        self.object_type = object_type
+        self.added = []
+        self.changed = []
+        self.deleted = []
+        self.unchanged = []
+        self.summary = None
+
+    def __str__(self):
+        lines = ['{}: {} added, {} changed, {} deleted, {} unchanged'.format(
+            self.object_type.capitalize(), len(self.added), len(self.changed),
+            len(self.deleted), len(self.unchanged)
+        )]
+        lines.extend('  + ' + name for name in self.added)
+        lines.extend('  ~ ' + name for name in self.changed)
+        lines.extend('  - ' + name for name in self.deleted)
+        return '\n'.join(lines)
+
+
+def _getargspec(f):
+    try:
+        return inspect.getfullargspec(f)
+    except AttributeError:  # for python2
+        return inspect.getargspec(f)
 
 
 class SchemaHandler(object):
+    """Base of the schema generators.
 
-    def __init__(self, assist, object_type=None):
+    Generators push their objects from a pool of workers, sending at most
+    rate requests per second to stay under the API quota.
+    """
+
+    def __init__(self, assist, object_type=None, workers=8, rate=5):
 
         self.assist = assist
         self.intents = []
         self.api = assist.api
         self.object_type = object_type
+        self.workers = workers
+        self.limiter = RateLimiter(rate) if rate else None
+        self._registered_ids = None
+        self._listing_lock = threading.Lock()
+        self._store = None
+        self.templates = templates
+
+    def _limit(self):
+        if self.limiter is not None:
+            self.limiter.acquire()
+
+    def agent_objects(self):
+        """Returns the objects registered in the agent"""
+        raise NotImplementedError
+
+    def registered_id(self, obj_name):
+        """Returns the ID of the agent's object named obj_name.
+
+        The agent's objects are listed on the first call and shared by the workers.
+        """
+        with self._listing_lock:
+            if self._registered_ids is None:
+                self._limit()
+                self._registered_ids = {o.name: o.id for o in self.agent_objects()}
+        return self._registered_ids.get(obj_name)
 
     # File set up
 
@@ -32,31 +124,27 @@ class SchemaHandler(object):
     @property
     def json_file(self):
         file_name = '{}.json'.format(self.object_type)
-        f = os.path.join(self.schema_dir, file_name)
-        if not os.path.isfile(f):
-            open(f, 'w+').close()
-        return f
+        return os.path.join(self.schema_dir, file_name)
 
     @property
-    def saved_schema(self):
-        with open(self.json_file, 'r') as f:
-            try:
-                return json.load(f)
-            except ValueError as e: # python2
-                return []
-            except json.decoder.JSONDecodeError: # python3
-                return []
+    def store(self):
+        """The saved schema, read once and indexed by name"""
+        if self._store is None:
+            self._store = SchemaStore(self.json_file)
+        return self._store
 
+    @property
+    def saved_schema(self):
+        return self.store.records
 
     @property
     def registered(self):
-        if self.saved_schema:
-            return [i for i in self.saved_schema if i if i.get('id')]
+        return self.store.registered
 
     def dump_schema(self, schema):
         print('Writing schema json to file')
-        with open(self.json_file, 'w') as f:
-            json.dump(schema, f, indent=4)
+        self.store.replace(schema)
+        self.store.save()
 
     # templates
     @property
@@ -80,12 +168,12 @@ class SchemaHandler(object):
 
 
     def load_yaml(self, template_file):
-        with open(template_file) as f:
-            try:
-                return yaml.safe_load(f)
-            except yaml.YAMLError as e:
-                print(e)
-                return []
+        """Returns the parsed template, cached until the file changes"""
+        try:
+            return self.templates.load(template_file)
+        except yaml.YAMLError as e:
+            print(e)
+            return []
 
     def user_says_yaml(self):
         return self.load_yaml(self.user_says_template)
@@ -96,16 +184,74 @@ class SchemaHandler(object):
 
 
     def grab_id(self, obj_name):
-        if self.registered:
-            for obj in self.registered:
-                if obj['name'] == obj_name:
-                    return obj['id']
+        return self.store.id(obj_name)
+
+    def delete(self, obj):
+        """Deletes a removed object from the agent"""
+        raise NotImplementedError
+
+    def sync(self, objects, push, dry_run=False):
+        """Sends the objects added or changed since the schema was saved, and deletes removed ones.
+
+        Objects are compared to the saved schema by the hash of their content,
+        stored in the schema next to their ID. Unless dry_run is True, the diff is
+        pushed and the schema of every object is saved.
+
+        Returns:
+            SchemaDiff -- the diff, with the PushSummary of the push
+        """
+        saved = OrderedDict(self.store.index)
+        diff = SchemaDiff(self.object_type)
+        records = {}
+        to_push = []
+        for obj in objects:
+            record = saved.pop(obj.name, {})
+            obj.id = record.get('id')
+            if obj.id and record.get('hash') == content_hash(obj):
+                diff.unchanged.append(obj.name)
+                records[obj.name] = record
+            else:
+                (diff.changed if obj.id else diff.added).append(obj.name)
+                to_push.append(obj)
+
+        removed = [_Removed(r['name'], r['id']) for r in saved.values() if r.get('id')]
+        diff.deleted = [r.name for r in removed]
+        print(diff)
+        if dry_run:
+            return diff
+
+        def apply(obj):
+            if isinstance(obj, _Removed):
+                return self.delete(obj)
+            return push(obj)
+
+        results, diff.summary = push_all(
+            to_push + removed, apply, self.api, self.object_type, self.workers, self.limiter
+        )
+        failed = set(name for name, _ in diff.summary.failures)
+        for obj in results:
+            if isinstance(obj, _Removed):
+                if obj.name in failed:  # deleted on the next sync
+                    records[obj.name] = saved[obj.name]
+                continue
+            record = dict(obj.__dict__)
+            if obj.id and obj.name not in failed:
+                record['hash'] = content_hash(obj)
+            records[obj.name] = record
+
+        names = [obj.name for obj in objects] + [r.name for r in removed]
+        self.dump_schema([records[name] for name in names if name in records])
+        print(diff.summary)
+        return diff
 
 
 class IntentGenerator(SchemaHandler):
 
-    def __init__(self, assist):
-        super(IntentGenerator, self).__init__(assist, object_type='intents')
+    def __init__(self, assist, **kwargs):
+        super(IntentGenerator, self).__init__(assist, object_type='intents', **kwargs)
+
+    def agent_objects(self):
+        return self.api.agent_intents
 
 
     @property
@@ -142,7 +288,7 @@ class IntentGenerator(SchemaHandler):
 
         params = []
         action_func = self.assist._intent_action_funcs[intent_name][0]
-        argspec = inspect.getargspec(action_func)
+        argspec = _getargspec(action_func)
         param_entity_map = self.assist._intent_mappings.get(intent_name)
 
         args, defaults = argspec.args, argspec.defaults
@@ -173,18 +319,19 @@ class IntentGenerator(SchemaHandler):
         return params
 
     def get_synonyms(self, annotation, entity):
-        raw_temp = self.entity_yaml()
-        for temp_dict in [d for d in raw_temp if d == entity]:
-            for entry in raw_temp.get(temp_dict):
-                if isinstance(entry, dict):
-                    for a, s in entry.items():
-                        if a == annotation:
-                            for synonym in s:
-                                yield(synonym)
+        try:
+            synonyms = self.templates.synonyms(self.entity_template, entity)
+        except yaml.YAMLError as e:
+            print(e)
+            return []
+        return synonyms.get(annotation, [])
 
     def build_user_says(self, intent):
-        raw = self.user_says_yaml()
-        intent_data = raw.get(intent.name)
+        try:
+            intent_data = self.templates.intents(self.user_says_template).get(intent.name)
+        except yaml.YAMLError as e:
+            print(e)
+            return
 
         if intent_data:
             phrases = intent_data.get('UserSays', [])
@@ -197,9 +344,11 @@ class IntentGenerator(SchemaHandler):
                     for synonym in self.get_synonyms(annotation, entity):
                         mapping.update({str(synonym):str(entity)})
 
+            # compiled once for all the phrases of the intent
+            annotator = PhraseAnnotator(mapping) if mapping else None
             for phrase in [p for p in phrases if p]:
                 if phrase != '':
-                    intent.add_example(phrase, templ_entity_map=mapping)
+                    intent.add_example(phrase, templ_entity_map=mapping, annotator=annotator)
 
             for event in [e for e in events if e]:
                 intent.add_event(event)
@@ -217,37 +366,47 @@ class IntentGenerator(SchemaHandler):
 
     def register(self, intent):
         """Registers a new intent and returns the Intent object with an ID"""
-        response = self.api.post_intent(intent.serialize)
+        self._limit()
+        try:
+            response = self.api.post_intent(intent.serialize)
+        except requests.HTTPError as e:
+            response = _conflict_response(e)
         print(response)
         print()
         if response['status']['code'] == 200:
             intent.id = response['id']
         elif response['status']['code'] == 409: # intent already exists
-            intent.id = next(i.id for i in self.api.agent_intents if i.name == intent.name)
+            intent.id = self.registered_id(intent.name)
             self.update(intent)
         return intent
 
     def update(self, intent):
+        self._limit()
         response = self.api.put_intent(intent.id, intent.serialize)
         print(response)
         print()
         if response['status']['code'] == 200:
             return response
 
-    def generate(self):
+    def delete(self, intent):
+        print('Deleting {} intent'.format(intent.name))
+        self._limit()
+        self.api.delete_intent(intent.id)
+        return intent
+
+    def generate(self, dry_run=False):
+        """Syncs the app's intents with the agent and returns the SchemaDiff, see sync"""
         print('Generating intent schema...')
-        schema = []
-        for intent in self.app_intents:
-            intent.id = self.grab_id(intent.name)
-            intent = self.push_intent(intent)
-            schema.append(intent.__dict__)
-        self.dump_schema(schema)
+        return self.sync(self.app_intents, self.push_intent, dry_run)
 
 
 class EntityGenerator(SchemaHandler):
 
-    def __init__(self, assist):
-        super(EntityGenerator, self).__init__(assist, object_type='entities')
+    def __init__(self, assist, **kwargs):
+        super(EntityGenerator, self).__init__(assist, object_type='entities', **kwargs)
+
+    def agent_objects(self):
+        return self.api.agent_entities
 
     def build_entities(self):
         raw_temp = self.entity_yaml()
@@ -270,17 +429,22 @@ class EntityGenerator(SchemaHandler):
 
     def register(self, entity):
         """Registers a new entity and returns the entity object with an ID"""
-        response = self.api.post_entity(entity.serialize)
+        self._limit()
+        try:
+            response = self.api.post_entity(entity.serialize)
+        except requests.HTTPError as e:
+            response = _conflict_response(e)
         print(response)
         print()
         if response['status']['code'] == 200:
             entity.id = response['id']
         if response['status']['code'] == 409: # entity already exists
-            entity.id = next(i.id for i in self.api.agent_entities if i.name == entity.name)
+            entity.id = self.registered_id(entity.name)
             self.update(entity)
         return entity
 
     def update(self, entity):
+        self._limit()
         response = self.api.put_entity(entity.id, entity.serialize)
         print(response)
         print()
@@ -297,14 +461,16 @@ class EntityGenerator(SchemaHandler):
             entity = self.register(entity)
         return entity
 
-    def generate(self):
+    def delete(self, entity):
+        print('Deleting {} entity'.format(entity.name))
+        self._limit()
+        self.api.delete_entity(entity.id)
+        return entity
+
+    def generate(self, dry_run=False):
+        """Syncs the template's entities with the agent and returns the SchemaDiff, see sync"""
         print('Generating entity schema...')
-        schema = []
-        for entity in self.build_entities():
-            entity.id = self.grab_id(entity.name)
-            entity = self.push_entity(entity)
-            schema.append(entity.__dict__)
-        self.dump_schema(schema)
+        return self.sync(list(self.build_entities()), self.push_entity, dry_run)
 
 
 
@@ -398,7 +564,7 @@ class TemplateCreator(SchemaHandler):
         for intent in self.assist._intent_action_funcs:
             entity_map = self.assist._intent_mappings.get(intent)
             action_func = self.assist._intent_action_funcs[intent][0]
-            args = inspect.getargspec(action_func).args
+            args = _getargspec(action_func).args
 
             # dont add API 'sys' entities to the template
             if entity_map:
@@ -0,0 +1,85 @@
+"""Saved schema of the objects registered in the agent."""
+
+import json
+import os
+import tempfile
+from collections import OrderedDict
+
+
+class SchemaStore(object):
+    """Records of a schema file, loaded once and indexed by name.
+
+    The file is read on first access, and only written by :meth:`save`, which
+    replaces it atomically so an interrupted run never leaves it truncated.
+
+    Arguments:
+        path {str} -- path of the JSON schema file, which may not exist yet
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._index = None
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                records = json.load(f)
+        except (IOError, OSError, ValueError):  # missing, empty or corrupt
+            records = []
+        if not isinstance(records, list):
+            records = []
+        return OrderedDict(
+            (r["name"], r) for r in records if isinstance(r, dict) and r.get("name")
+        )
+
+    @property
+    def index(self):
+        """Records mapped to their name, in the order they were saved"""
+        if self._index is None:
+            self._index = self._load()
+        return self._index
+
+    @property
+    def records(self):
+        return list(self.index.values())
+
+    @property
+    def registered(self):
+        """Records of the objects that have an ID"""
+        return [r for r in self.index.values() if r.get("id")]
+
+    def get(self, name):
+        return self.index.get(name)
+
+    def id(self, name):
+        """Returns the ID of the object named name, None if it is not registered"""
+        record = self.index.get(name)
+        return record.get("id") if record else None
+
+    def replace(self, records):
+        """Sets the records to save"""
+        self._index = OrderedDict((r["name"], r) for r in records)
+
+    def _mode(self):
+        try:
+            return os.stat(self.path).st_mode & 0o777
+        except OSError:
+            return 0o644
+
+    def save(self):
+        """Writes the records to a temporary file and moves it over the schema file"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(
+            dir=directory, prefix=".", suffix=".json.tmp", text=True
+        )
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.records, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            # mkstemp creates files only readable by their owner
+            os.chmod(tmp_path, self._mode())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
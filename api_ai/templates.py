@@ -0,0 +1,93 @@
+"""Parsed user_says.yaml and entities.yaml templates.
+
+Templates are parsed once and cached until their file changes, as schema
+generation reads them for every intent and every annotation.
+"""
+
+import os
+import threading
+
+from ruamel import yaml
+
+
+def safe_load(stream):
+    """Parses YAML with the C accelerated loader of ruamel.yaml when it is installed"""
+    if hasattr(yaml, "YAML"):
+        # the safe loader uses ruamel.yaml.clib, or pure Python without it
+        return yaml.YAML(typ="safe").load(stream)
+    loader = getattr(yaml, "CSafeLoader", None)
+    if loader is not None:
+        return yaml.load(stream, Loader=loader)
+    return yaml.safe_load(stream)
+
+
+def _synonym_index(entities):
+    """Maps entity names to their entry values mapped to their synonyms"""
+    index = {}
+    if not isinstance(entities, dict):
+        return index
+    for entity, entries in entities.items():
+        values = index.setdefault(entity, {})
+        for entry in entries or []:
+            if isinstance(entry, dict):
+                for value, synonyms in entry.items():
+                    values.setdefault(value, []).extend(synonyms or [])
+    return index
+
+
+class _Template(object):
+    __slots__ = ("key", "data", "synonyms")
+
+    def __init__(self, key, data):
+        self.key = key
+        self.data = data
+        self.synonyms = None
+
+
+class TemplateRepository(object):
+    """Cache of parsed templates, keyed by path and invalidated by their mtime and size.
+
+    Parsed templates are shared by every caller and must not be modified.
+    """
+
+    def __init__(self, loader=safe_load):
+        self.loader = loader
+        self.parses = 0
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def _template(self, path):
+        stat = os.stat(path)
+        key = (getattr(stat, "st_mtime_ns", stat.st_mtime), stat.st_size)
+        template = self._templates.get(path)
+        if template is None or template.key != key:
+            with open(path) as f:
+                data = self.loader(f)
+            template = _Template(key, data)
+            with self._lock:
+                self._templates[path] = template
+                self.parses += 1
+        return template
+
+    def load(self, path):
+        """Returns the parsed template, None if the file is empty"""
+        return self._template(path).data
+
+    def intents(self, path):
+        """Returns the user_says template's intent names mapped to their examples"""
+        data = self.load(path)
+        return data if isinstance(data, dict) else {}
+
+    def synonyms(self, path, entity):
+        """Returns the entities template's entries of entity mapped to their synonyms"""
+        template = self._template(path)
+        if template.synonyms is None:
+            template.synonyms = _synonym_index(template.data)
+        return template.synonyms.get(entity, {})
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+
+
+templates = TemplateRepository()
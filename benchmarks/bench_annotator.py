@@ -0,0 +1,101 @@
+"""Benchmark annotating 10,000 phrases with an entity map of 5,000 synonyms.
+
+Phrases are annotated by UserDefinedExample, with one annotator compiled for
+the whole map, then the way they used to be: searching each phrase with one
+regex per value and recursing on both sides of the first value found. The
+latter is timed on a few phrases and extrapolated, and its output compared.
+
+    python -m benchmarks.bench_annotator
+"""
+
+import random
+import re
+import time
+
+from api_ai.models import PhraseAnnotator, UserDefinedExample
+
+N_PHRASES = 10000
+N_SYNONYMS = 5000
+N_LEGACY = 20
+
+WORDS = (
+    "book table order please for tonight with the a want would like to me find near "
+    "some at and"
+).split()
+
+
+def build_entity_map(rng):
+    entity_map = {}
+    while len(entity_map) < N_SYNONYMS:
+        words = rng.randint(1, 3)
+        value = " ".join("syn{}".format(rng.randrange(20000)) for _ in range(words))
+        entity_map[value] = "entity{}".format(len(entity_map) % 50)
+    return entity_map
+
+
+def build_phrases(rng, values):
+    phrases = []
+    for _ in range(N_PHRASES):
+        words = [rng.choice(WORDS) for _ in range(8)]
+        for _ in range(rng.randint(0, 2)):
+            words.insert(rng.randrange(len(words)), rng.choice(values))
+        phrases.append(" ".join(words))
+    return phrases
+
+
+def legacy_annotate(phrase, entity_map):
+    """Returns the data of phrase as the recursive UserDefinedExample built it"""
+    data = []
+
+    def parse(sub_phrase):
+        if not sub_phrase:
+            return
+        for value in entity_map:
+            if re.search(r"\b{}\b".format(value), sub_phrase):
+                parts = sub_phrase.split(value, 1)
+                parse(parts[0])
+                data.append({"text": value, "meta": "@" + entity_map[value]})
+                parse(parts[1])
+                return
+        data.append({"text": sub_phrase})
+
+    parse(phrase)
+    return data
+
+
+def main():
+    rng = random.Random(0)
+    entity_map = build_entity_map(rng)
+    phrases = build_phrases(rng, list(entity_map))
+
+    start = time.perf_counter()
+    annotator = PhraseAnnotator(entity_map)
+    compiled = time.perf_counter() - start
+    examples = [UserDefinedExample(p, entity_map, annotator) for p in phrases]
+    single_pass = time.perf_counter() - start
+
+    start = time.perf_counter()
+    legacy = [legacy_annotate(p, entity_map) for p in phrases[:N_LEGACY]]
+    recursive = (time.perf_counter() - start) * N_PHRASES / N_LEGACY
+
+    mismatches = sum(
+        [{"text": d["text"], "meta": d["meta"]} if "meta" in d else d for d in e.data]
+        != old
+        for e, old in zip(examples, legacy)
+    )
+
+    print("{} phrases, {} synonyms".format(N_PHRASES, N_SYNONYMS))
+    print(
+        "single pass:   {:8.3f} s (compiling the map: {:.3f} s)".format(
+            single_pass, compiled
+        )
+    )
+    print(
+        "recursive:     {:8.3f} s (extrapolated from {} phrases, {} differ)".format(
+            recursive, N_LEGACY, mismatches
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
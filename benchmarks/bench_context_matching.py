@@ -0,0 +1,96 @@
+"""Benchmark matching a request's contexts to context-dependent action views.
+
+Registers 1,000 intents, each with context-dependent views, and times how long
+the assistant takes to choose a view for a request carrying 50 active contexts.
+The legacy matcher, which scanned every context view of every intent and
+re-parsed the received context names for each one, is reproduced for comparison.
+
+    python -m benchmarks.bench_context_matching
+"""
+
+import random
+import timeit
+
+from flask import Flask
+
+from flask_assistant import Assistant, ask
+from flask_assistant.manager import parse_context_name
+
+N_INTENTS = 1000
+N_CONTEXTS = 50
+VIEWS_PER_INTENT = 3
+
+
+def build_assistant():
+    app = Flask(__name__)
+    assist = Assistant(app, project_id="bench")
+    rnd = random.Random(0)
+    context_names = ["context-{}".format(i) for i in range(N_CONTEXTS * 2)]
+
+    for i in range(N_INTENTS):
+        intent_name = "intent-{}".format(i)
+
+        for j in range(VIEWS_PER_INTENT):
+
+            def view():
+                return ask("ok")
+
+            view.__name__ = "view_{}_{}".format(i, j)
+            required = rnd.sample(context_names, rnd.randint(1, 3))
+            assist.context(*required)(assist.action(intent_name)(view))
+
+    return assist
+
+
+def build_contexts():
+    full = "projects/bench/agent/sessions/1/contexts/context-{}"
+    return [{"name": full.format(i), "lifespanCount": 5} for i in range(N_CONTEXTS)]
+
+
+def legacy_choose_context_view(assist, intent_name, context_in):
+    choice = None
+    for func in assist._func_contexts:
+        required_names = list(assist._func_contexts[func])
+        recieved_context_names = [parse_context_name(c) for c in context_in]
+        met = [r for r in required_names if r in recieved_context_names]
+        if set(met) == set(required_names):
+            if func in assist._intent_action_funcs[intent_name]:
+                choice = func
+    return choice
+
+
+def main():
+    assist = build_assistant()
+    contexts = build_contexts()
+    intent_name = "intent-{}".format(N_INTENTS // 2)
+    number = 200
+
+    with assist.app.test_request_context():
+        assist.context_in = contexts
+        table = assist.compile()
+        dispatch = table[intent_name]
+
+        legacy = legacy_choose_context_view(assist, intent_name, contexts)
+        indexed = assist._choose_context_view(dispatch)
+        assert legacy is (indexed.func if indexed else None)
+
+        legacy_time = timeit.timeit(
+            lambda: legacy_choose_context_view(assist, intent_name, contexts),
+            number=number,
+        )
+        indexed_time = timeit.timeit(
+            lambda: assist._choose_context_view(dispatch), number=number
+        )
+
+    print(
+        "{} intents, {} context views, {} active contexts".format(
+            N_INTENTS, len(assist._func_contexts), N_CONTEXTS
+        )
+    )
+    print("legacy scan:     {:10.1f} us/request".format(legacy_time / number * 1e6))
+    print("indexed matcher: {:10.1f} us/request".format(indexed_time / number * 1e6))
+    print("speedup:         {:10.1f}x".format(legacy_time / indexed_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Measure the cold import time of flask_assistant with ``python -X importtime``.
+
+Each module is imported in a fresh interpreter, several times, and the
+cumulative import time of the median run is reported along with its slowest
+imports. google.cloud.dialogflow_v2 is included for comparison, as it used to
+be imported by the response package.
+
+    python -m benchmarks.bench_import_time
+"""
+
+import subprocess
+import sys
+
+RUNS = 5
+MODULES = ["flask", "flask_assistant", "google.cloud.dialogflow_v2"]
+
+
+def import_times(module):
+    """Returns {module name: cumulative microseconds} of a cold import of module"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import {}".format(module)],
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    for module in MODULES:
+        runs = sorted(
+            (import_times(module) for _ in range(RUNS)), key=lambda t: t[module]
+        )
+        median = runs[len(runs) // 2]
+        print("{:30} {:8.1f} ms".format(module, median[module] / 1000))
+        if module == "flask_assistant":
+            slowest = sorted(median.items(), key=lambda item: -item[1])[1:6]
+            for name, us in slowest:
+                print("    {:26} {:8.1f} ms".format(name, us / 1000))
+
+
+if __name__ == "__main__":
+    main()
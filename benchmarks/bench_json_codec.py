@@ -0,0 +1,106 @@
+"""Micro-benchmark the JSON codecs on webhook requests and responses.
+
+Requests are the payload shapes produced by ``tests.helpers.build_payload``;
+responses are large list and carousel responses. Flask's json module, which
+was used before codecs were pluggable, is included as a baseline.
+
+    python -m benchmarks.bench_json_codec
+"""
+
+import json
+import timeit
+
+from flask import Flask, json as flask_json
+
+from flask_assistant import Assistant, ask
+from flask_assistant.codec import OrjsonCodec, StdlibCodec
+from tests.helpers import build_payload
+
+NUMBER = 2000
+
+
+def request_payloads():
+    contexts = [
+        {
+            "name": "projects/bench/agent/sessions/1/contexts/context-{}".format(i),
+            "lifespanCount": 5,
+            "parameters": {"param-{}".format(j): "value" for j in range(5)},
+        }
+        for i in range(10)
+    ]
+    return {
+        "simple request": build_payload("greeting"),
+        "request with params": build_payload(
+            "order", params={"param-{}".format(i): "value" for i in range(20)}
+        ),
+        "request with contexts": build_payload("order", contexts=contexts),
+    }
+
+
+def response_payloads():
+    app = Flask(__name__)
+    Assistant(app, project_id="bench")
+    app.config["INTEGRATIONS"] = ["ACTIONS_ON_GOOGLE", "DIALOGFLOW_MESSENGER"]
+
+    with app.test_request_context():
+        big_list = ask("Here are your options").build_list("Options")
+        big_carousel = ask("Here are your options").build_carousel()
+        for i in range(30):
+            for resp in (big_list, big_carousel):
+                resp.add_item(
+                    "Item {}".format(i),
+                    key="item-{}".format(i),
+                    synonyms=["option {}".format(i), "number {}".format(i)],
+                    description="The description of item {}".format(i),
+                    img_url="https://example.com/item-{}.png".format(i),
+                )
+        return {
+            "list response": big_list._render(),
+            "carousel response": big_carousel._render(),
+        }
+
+
+def header(title, codecs):
+    names = ["flask.json"] + [name for name, _ in codecs]
+    return "{:24}".format(title) + "".join("{:>12} ".format(n) for n in names)
+
+
+def main():
+    app = Flask(__name__)
+    codecs = [("stdlib", StdlibCodec())]
+    try:
+        codecs.append(("orjson", OrjsonCodec()))
+    except ImportError:
+        print("orjson is not installed, skipping")
+
+    print(header("loads (us)", codecs))
+    with app.app_context():
+        for name, payload in request_payloads().items():
+            raw = payload.encode("utf-8")
+            times = [timeit.timeit(lambda: flask_json.loads(raw), number=NUMBER)]
+            for _, codec in codecs:
+                times.append(timeit.timeit(lambda: codec.loads(raw), number=NUMBER))
+            print(
+                "{:24}".format(name)
+                + "".join("{:12.1f} ".format(t / NUMBER * 1e6) for t in times)
+            )
+
+        print()
+        print(header("dumps (us)", codecs))
+        for name, payload in response_payloads().items():
+            times = [
+                timeit.timeit(
+                    lambda: flask_json.dumps(payload).encode("utf-8"), number=NUMBER
+                )
+            ]
+            for _, codec in codecs:
+                times.append(timeit.timeit(lambda: codec.dumps(payload), number=NUMBER))
+            print(
+                "{:24}".format(name)
+                + "".join("{:12.1f} ".format(t / NUMBER * 1e6) for t in times)
+            )
+            assert json.loads(codecs[-1][1].dumps(payload)) == payload
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Benchmark the direct AWS Lambda handler against the WSGI emulation.
+
+API Gateway proxy events are recorded once, then each handler is invoked with
+them in a loop, as a warm container would be. Turn logging is turned down to
+warnings.
+
+    python -m benchmarks.bench_lambda
+"""
+
+import base64
+import logging
+import time
+
+from flask import Flask
+
+from flask_assistant import Assistant, ask, context_manager, logger
+from tests.helpers import build_payload
+
+N_INVOCATIONS = 2000
+
+
+def build_assistant():
+    app = Flask(__name__)
+    assist = Assistant(app, route="/", project_id="bench")
+
+    @assist.action("order-pizza")
+    def order_pizza(size, topping):
+        context_manager.add("pizza-order", parameters={"size": size})
+        return ask("One {} {} pizza coming up".format(size, topping))
+
+    @assist.action("greeting")
+    def greet():
+        return ask("Hi! What would you like?").suggest("Pizza", "Salad")
+
+    return assist
+
+
+def record_event(payload, base64_encoded=False):
+    """Returns an API Gateway proxy event as received by the Lambda function"""
+    body = payload
+    if base64_encoded:
+        body = base64.b64encode(payload.encode("utf-8")).decode("ascii")
+    return {
+        "resource": "/",
+        "path": "/",
+        "httpMethod": "POST",
+        "headers": {
+            "Content-Type": "application/json; charset=UTF-8",
+            "User-Agent": "Google-Dialogflow",
+        },
+        "requestContext": {"stage": "prod", "httpMethod": "POST"},
+        "body": body,
+        "isBase64Encoded": base64_encoded,
+    }
+
+
+def record_events():
+    order = build_payload("order-pizza", params={"size": "large", "topping": "ham"})
+    return [record_event(order), record_event(build_payload("greeting"))]
+
+
+def bench(handler, events):
+    start = time.process_time()
+    for i in range(N_INVOCATIONS):
+        resp = handler(events[i % len(events)], None)
+        assert resp["statusCode"] == 200
+    return time.process_time() - start
+
+
+def main():
+    # measure fulfillment, not the turn summaries logged at INFO
+    logger.setLevel(logging.WARNING)
+    assist = build_assistant()
+    assist.compile()
+    events = record_events()
+
+    wsgi_time = bench(lambda event, _context: assist.run_aws_lambda(event), events)
+    direct_time = bench(assist.lambda_handler, events)
+    # run_aws_lambda does not decode base64 encoded bodies
+    encoded_time = bench(
+        assist.lambda_handler,
+        [record_event(e["body"], base64_encoded=True) for e in events],
+    )
+
+    print("{} invocations".format(N_INVOCATIONS))
+    print("run_aws_lambda:           {:8.0f} /s".format(N_INVOCATIONS / wsgi_time))
+    print("lambda_handler:           {:8.0f} /s".format(N_INVOCATIONS / direct_time))
+    print("lambda_handler (base64):  {:8.0f} /s".format(N_INVOCATIONS / encoded_time))
+
+
+if __name__ == "__main__":
+    main()
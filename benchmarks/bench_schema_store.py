@@ -0,0 +1,92 @@
+"""Benchmark generating the schema of a 2,000 intent agent.
+
+The management API is replaced by a stub answering immediately, so the time
+measured is the schema handling: looking up saved IDs and hashes, and writing
+the schema file. The lookups are also timed the way they used to be done, by
+re-reading the schema file for each intent.
+
+    python -m benchmarks.bench_schema_store
+"""
+
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+
+from flask import Flask
+
+from api_ai.models import Intent
+from api_ai.schema_handlers import IntentGenerator
+from flask_assistant import Assistant
+
+N_INTENTS = 2000
+
+
+class StubApi(object):
+    """Management API creating and updating every intent instantly"""
+
+    def post_intent(self, intent_json):
+        name = json.loads(intent_json)["name"]
+        return {"id": "{}-id".format(name), "status": {"code": 200}}
+
+    def put_intent(self, intent_id, intent_json):
+        return {"status": {"code": 200}}
+
+
+def build_intents():
+    intents = []
+    for i in range(N_INTENTS):
+        intent = Intent("intent{}".format(i))
+        intent.add_action("action{}".format(i))
+        intent.add_example("example phrase number {}".format(i))
+        intents.append(intent)
+    return intents
+
+
+def legacy_lookups(json_file, names):
+    """Looks up IDs as grab_id did, parsing the schema file twice per intent"""
+    for name in names:
+        for _ in range(2):
+            with open(json_file) as f:
+                registered = [i for i in json.load(f) if i.get("id")]
+        next((i["id"] for i in registered if i["name"] == name), None)
+
+
+def main():
+    root = tempfile.mkdtemp()
+    app = Flask(__name__, root_path=root)
+    assist = Assistant(app, project_id="bench")
+    assist.api = StubApi()
+
+    def sync(intents):
+        # a new generator, as each run of the schema command would create
+        generator = IntentGenerator(assist, workers=8, rate=None)
+        start = time.perf_counter()
+        generator.sync(intents, generator.push_intent)
+        return time.perf_counter() - start, generator.json_file
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        first, json_file = sync(build_intents())
+        unchanged, _ = sync(build_intents())
+
+    names = ["intent{}".format(i) for i in range(N_INTENTS)]
+    start = time.perf_counter()
+    legacy_lookups(json_file, names[:200])
+    legacy = (time.perf_counter() - start) * N_INTENTS / 200
+
+    print(
+        "{} intents, schema file of {} kB".format(
+            N_INTENTS, os.path.getsize(json_file) // 1024
+        )
+    )
+    print("first sync:                 {:8.3f} s".format(first))
+    print("sync, all unchanged:        {:8.3f} s".format(unchanged))
+    print(
+        "lookups re-reading file:    {:8.3f} s (extrapolated from 200)".format(legacy)
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Benchmark building intents from the user_says.yaml and entities.yaml templates.
+
+Intents of a generated agent are built with the template cache, then with a
+repository parsing the templates on every read, as they used to be. The latter
+is timed on a few intents and extrapolated.
+
+    python -m benchmarks.bench_templates
+"""
+
+import tempfile
+import time
+
+from flask import Flask
+from ruamel import yaml
+
+from api_ai.schema_handlers import IntentGenerator
+from api_ai.templates import TemplateRepository
+from flask_assistant import Assistant
+
+N_INTENTS = 200
+N_ENTITIES = 20
+N_VALUES = 10
+N_SYNONYMS = 5
+
+
+class UncachedRepository(TemplateRepository):
+    def _template(self, path):
+        self.clear()
+        return super(UncachedRepository, self)._template(path)
+
+
+def write_templates(root):
+    user_says, entities = [], []
+    for e in range(N_ENTITIES):
+        entities.append("entity{}:".format(e))
+        for v in range(N_VALUES):
+            synonyms = ", ".join(
+                "syn{}_{}_{}".format(e, v, s) for s in range(N_SYNONYMS)
+            )
+            entities.append("  - value{}_{}: [{}]".format(e, v, synonyms))
+    for i in range(N_INTENTS):
+        e = i % N_ENTITIES
+        user_says.append("intent{}:".format(i))
+        user_says.append("  UserSays:")
+        for v in range(3):
+            user_says.append("    - I would like value{}_{} please".format(e, v))
+        user_says.append("  Annotations:")
+        for v in range(3):
+            user_says.append("    - value{}_{}: entity{}".format(e, v, e))
+
+    for name, lines in [("user_says", user_says), ("entities", entities)]:
+        with open("{}/templates/{}.yaml".format(root, name), "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+def build_generator():
+    root = tempfile.mkdtemp()
+    app = Flask(__name__, root_path=root)
+    assist = Assistant(app, project_id="bench")
+
+    def action():
+        pass
+
+    for i in range(N_INTENTS):
+        assist.action("intent{}".format(i))(action)
+
+    generator = IntentGenerator(assist)
+    generator.template_dir  # creates the directory
+    write_templates(root)
+    return generator
+
+
+def bench(generator, repository, n_intents=N_INTENTS):
+    """Returns the time to build every intent and the number of parses it takes"""
+    generator.templates = repository
+    start = time.perf_counter()
+    for i in range(n_intents):
+        generator.build_intent("intent{}".format(i))
+    elapsed = time.perf_counter() - start
+    scale = N_INTENTS / n_intents
+    return elapsed * scale, int(repository.parses * scale)
+
+
+def main():
+    generator = build_generator()
+    # ruamel.yaml leaves Parser unset when it parses with ruamel.yaml.clib
+    parser = "pure Python" if yaml.YAML(typ="safe").Parser else "C"
+
+    cached, cached_parses = bench(generator, TemplateRepository())
+    uncached, uncached_parses = bench(generator, UncachedRepository(), 3)
+
+    print(
+        "{} intents, {} entities of {} values ({} parser)".format(
+            N_INTENTS, N_ENTITIES, N_VALUES, parser
+        )
+    )
+    print("cached templates:   {:8.3f} s, {} parses".format(cached, cached_parses))
+    print(
+        "parsed on each read:{:8.3f} s, {} parses (extrapolated from 3 intents)".format(
+            uncached, uncached_parses
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Measure the per-turn cost of decoding the user profile from an ID token.
+
+Turns of one conversation carry the same ID token. They are fulfilled by an
+assistant verifying the token on every turn and by one keeping verified
+tokens in its cache. Signing certificates are served from memory, so only
+verification and decoding are measured, not the network.
+
+    python -m benchmarks.bench_token_cache
+"""
+
+import json
+import logging
+import timeit
+
+from flask import Flask
+
+from flask_assistant import Assistant, logger, profile, tell
+from flask_assistant import utils
+from tests.helpers import build_payload
+from tests.test_utils import CLIENT_ID, make_signing_key, make_token
+
+NUMBER = 500
+
+
+class StaticCertificates(object):
+    def __init__(self, certs):
+        self._certs = certs
+
+    def certs(self):
+        return self._certs
+
+
+def build_assistant(token_cache_size):
+    app = Flask(__name__)
+    assist = Assistant(
+        app,
+        project_id="bench",
+        client_id=CLIENT_ID,
+        token_cache_size=token_cache_size,
+    )
+
+    @assist.action("greeting")
+    def greeting():
+        return tell("Hello {}".format(profile["name"]))
+
+    return assist
+
+
+def main():
+    logger.setLevel(logging.WARNING)
+    signer, cert_pem = make_signing_key()
+    utils.certificate_cache = StaticCertificates({"test-key": cert_pem})
+
+    payload = json.loads(build_payload("greeting"))
+    payload["originalDetectIntentRequest"]["payload"] = {
+        "user": {"idToken": make_token(signer)}
+    }
+    payload = json.dumps(payload)
+
+    print("{} turns carrying the same ID token".format(NUMBER))
+    for label, size in [("verify every turn", 0), ("verified token cache", 1024)]:
+        assist = build_assistant(size)
+        client = assist.app.test_client()
+        client.post("/", data=payload)  # warm up
+
+        def turn():
+            resp = client.post("/", data=payload)
+            assert b"Hello Test User" in resp.data
+
+        elapsed = timeit.timeit(turn, number=NUMBER)
+        print("{:22} {:8.1f} us per turn".format(label, elapsed / NUMBER * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Measure memory allocated per webhook turn with tracemalloc.
+
+Turns are fulfilled in a loop with a set of received contexts, and the peak
+memory allocated while handling each turn is reported along with the number
+of context managers created. The context manager should be created once per
+turn, however often handlers and turn logging access it.
+
+    python -m benchmarks.bench_turn_allocations
+"""
+
+import json
+import logging
+import tracemalloc
+
+from flask import Flask
+
+from flask_assistant import Assistant, ask, context_manager, logger
+from flask_assistant import manager as manager_module
+from tests.helpers import build_payload, run
+
+N_TURNS = 500
+N_CONTEXTS = 10
+
+
+def build_assistant():
+    app = Flask(__name__)
+    assist = Assistant(app, project_id="bench")
+
+    @assist.action("order")
+    def order(size):
+        for _ in range(10):  # handlers commonly read the manager repeatedly
+            context_manager.get("context-0")
+        context_manager.add("order", parameters={"size": size})
+        return ask("Ordered a {} pizza".format(size))
+
+    return assist
+
+
+def build_request():
+    contexts = [
+        {
+            "name": "projects/bench/agent/sessions/1/contexts/context-{}".format(i),
+            "lifespanCount": 5,
+            "parameters": {"size": "large"},
+        }
+        for i in range(N_CONTEXTS)
+    ]
+    return build_payload("order", params={"size": "large"}, contexts=contexts)
+
+
+def main():
+    # turn summaries read the context manager too, but are not written anywhere
+    logger.setLevel(logging.INFO)
+    logger.handlers = [logging.NullHandler()]
+    logger.propagate = False
+    assist = build_assistant()
+    assist.compile()
+    payload = build_request()
+
+    managers = []
+    init = manager_module.ContextManager.__init__
+
+    def counting_init(self, *args, **kwargs):
+        managers.append(1)
+        init(self, *args, **kwargs)
+
+    manager_module.ContextManager.__init__ = counting_init
+
+    async def measure():
+        peaks = []
+        for _ in range(N_TURNS):
+            request_json = json.loads(payload)
+            tracemalloc.reset_peak()
+            start, _ = tracemalloc.get_traced_memory()
+            await assist.fulfill(request_json)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - start)
+        return peaks
+
+    tracemalloc.start()
+    peaks = run(measure())
+    tracemalloc.stop()
+
+    peaks.sort()
+    print("{} turns with {} received contexts".format(N_TURNS, N_CONTEXTS))
+    print("context managers per turn: {:8.2f}".format(len(managers) / N_TURNS))
+    print(
+        "peak allocated per turn:   {:8.0f} bytes (median)".format(
+            peaks[len(peaks) // 2]
+        )
+    )
+    print("                           {:8.0f} bytes (max)".format(peaks[-1]))
+
+
+if __name__ == "__main__":
+    main()
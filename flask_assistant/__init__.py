@@ -1,4 +1,6 @@
+import importlib
 import logging
+import sys
 
 logger = logging.getLogger("flask_assistant")
 handler = logging.StreamHandler()
@@ -38,6 +40,37 @@ from flask_assistant.response import (
 
 from flask_assistant.manager import Context
 
-import flask_assistant.utils
+# Subsystems most webhooks do not use are imported on first access, keeping
+# google.auth, requests and the Dialogflow management API out of the import.
+_lazy_attributes = {
+    "utils": ("flask_assistant.utils", None),
+    "decode_token": ("flask_assistant.utils", "decode_token"),
+    "certificate_cache": ("flask_assistant.utils", "certificate_cache"),
+    "hangouts": ("flask_assistant.response.hangouts", None),
+    "ApiAi": ("api_ai.api", "ApiAi"),
+    "hass": ("flask_assistant.hass", None),
+    "HassRemote": ("flask_assistant.hass", "HassRemote"),
+}
 
-from api_ai.api import ApiAi
+
+def __getattr__(name):
+    try:
+        module_name, attr = _lazy_attributes[name]
+    except KeyError:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    module = importlib.import_module(module_name)
+    value = module if attr is None else getattr(module, attr)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_attributes))
+
+
+if sys.version_info < (3, 7):
+    # module __getattr__ (PEP 562) is not supported, import everything but HASS
+    import flask_assistant.utils
+    from flask_assistant.utils import decode_token, certificate_cache
+    from flask_assistant.response import hangouts
+    from api_ai.api import ApiAi
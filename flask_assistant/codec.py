@@ -0,0 +1,113 @@
+"""JSON codecs used to parse webhook requests and serialize responses.
+
+A codec is any object providing ``loads(bytes)`` and ``dumps(obj) -> bytes``.
+The Assistant uses the fastest available codec unless one is given with its
+``json_codec`` argument.
+"""
+
+import decimal
+import json
+import uuid
+from datetime import date
+
+from werkzeug.http import http_date
+
+try:
+    import dataclasses
+except ImportError:  # python < 3.7
+    dataclasses = None
+
+
+def _default(o):
+    """Serializes the types Flask's JSON provider supports beyond plain JSON"""
+    if isinstance(o, date):
+        return http_date(o)
+
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+
+    if dataclasses and dataclasses.is_dataclass(o):
+        return dataclasses.asdict(o)
+
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+
+    raise TypeError(
+        "Object of type {} is not JSON serializable".format(type(o).__name__)
+    )
+
+
+class StdlibCodec(object):
+    """JSON codec using the standard library :mod:`json` module"""
+
+    name = "json"
+
+    def loads(self, data):
+        return json.loads(data)
+
+    def dumps(self, obj):
+        return json.dumps(
+            obj, ensure_ascii=False, separators=(",", ":"), default=_default
+        ).encode("utf-8")
+
+
+class OrjsonCodec(object):
+    """JSON codec using `orjson <https://github.com/ijl/orjson>`_, serializing directly to bytes"""
+
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+
+        self._orjson = orjson
+        self.loads = orjson.loads
+        # dates and dataclasses go through _default, to serialize them as Flask does
+        self._option = (
+            orjson.OPT_PASSTHROUGH_DATETIME
+            | orjson.OPT_PASSTHROUGH_DATACLASS
+            | orjson.OPT_NON_STR_KEYS
+        )
+        self._fallback = StdlibCodec()
+
+    def dumps(self, obj):
+        try:
+            return self._orjson.dumps(obj, default=_default, option=self._option)
+        except TypeError:
+            # e.g. integers wider than 64 bits, which the standard library supports
+            return self._fallback.dumps(obj)
+
+
+_codecs = {"json": StdlibCodec, "stdlib": StdlibCodec, "orjson": OrjsonCodec}
+
+
+def get_codec(codec=None):
+    """Returns a JSON codec instance.
+
+    Keyword Arguments:
+        codec {str or object} -- "orjson", "json", a codec object providing
+                                 loads and dumps, or None to use orjson when it
+                                 is installed and the standard library otherwise
+                                 (default: {None})
+    """
+    if codec is None or codec == "auto":
+        try:
+            return OrjsonCodec()
+        except ImportError:
+            return StdlibCodec()
+
+    if isinstance(codec, str):
+        try:
+            return _codecs[codec]()
+        except KeyError:
+            raise ValueError(
+                "Unknown JSON codec {!r}, expected one of {}".format(
+                    codec, sorted(_codecs)
+                )
+            )
+
+    if not (hasattr(codec, "loads") and hasattr(codec, "dumps")):
+        raise TypeError("A JSON codec must provide loads and dumps methods")
+    return codec
+
+
+default_codec = get_codec()
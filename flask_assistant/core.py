@@ -1,17 +1,34 @@
+import base64
+import importlib.util
 import inspect
+import logging
 import sys
 import os
+from contextlib import contextmanager
 from functools import wraps, partial
 
-import aniso8601
-from flask import current_app, json, request as flask_request, _app_ctx_stack
+from flask import (
+    current_app,
+    g,
+    has_app_context,
+    json,
+    request as flask_request,
+)
 from werkzeug.local import LocalProxy
 
 from flask_assistant import logger
 from flask_assistant.response import _Response
 from flask_assistant.manager import ContextManager, parse_context_name
-from api_ai.api import ApiAi
-from io import StringIO
+from flask_assistant.dispatch import compile_dispatch
+from flask_assistant.dispatch import (  # noqa: F401, moved from core
+    _converter_shorthands,
+)
+from flask_assistant.codec import get_codec
+from flask_assistant.turnlog import LazyJSON, TurnLogger, start_log_listener
+from flask_assistant.state import TurnState, current_turn
+from flask_assistant.storage import UserStorage, get_storage_codec
+from flask_assistant.tokens import VerifiedTokenCache
+from io import BytesIO
 
 
 def find_assistant():  # Taken from Flask-ask courtesy of @voutilad
@@ -31,23 +48,66 @@ def find_assistant():  # Taken from Flask-ask courtesy of @voutilad
                     return getattr(blueprints[blueprint_name], "assist")
 
 
-request = LocalProxy(lambda: find_assistant().request)
-intent = LocalProxy(lambda: find_assistant().intent)
-access_token = LocalProxy(lambda: find_assistant().access_token)
-context_in = LocalProxy(lambda: find_assistant().context_in)
-context_manager = LocalProxy(lambda: find_assistant().context_manager)
-convert_errors = LocalProxy(lambda: find_assistant().convert_errors)
-session_id = LocalProxy(lambda: find_assistant().session_id)
-user = LocalProxy(lambda: find_assistant().user)
-storage = LocalProxy(lambda: find_assistant().storage)
-profile = LocalProxy(lambda: find_assistant().profile)
+def _active_turn():
+    """Returns the state of the turn being fulfilled.
+
+    Once a turn ends its state remains readable from the application context it
+    ran in, such as a context preserved by ``with app.test_client():``, but never
+    from other requests.
+    """
+    state = current_turn.get()
+    if state is None and has_app_context():
+        state = g.get("_assist_turn")
+    return state
+
+
+def _current_assistant():
+    """Returns the Assistant fulfilling the current turn, or the app's Assistant"""
+    state = _active_turn()
+    if state is not None:
+        return state.assist
+    return find_assistant()
+
+
+def _turn_local(name):
+    """Returns a lookup of name on the current turn's state, for use by a LocalProxy"""
+
+    def lookup():
+        state = _active_turn()
+        if state is None:
+            return getattr(find_assistant(), name)
+        return getattr(state, name)
+
+    return lookup
 
-# Converter shorthands for commonly used system entities
-_converter_shorthands = {
-    "date": aniso8601.parse_date,  # Returns date
-    "date-period": aniso8601.parse_interval,  # Returns (date, date)
-    "time": aniso8601.parse_time,  # Returns time
-}
+
+request = LocalProxy(_turn_local("request"))
+intent = LocalProxy(_turn_local("intent"))
+access_token = LocalProxy(_turn_local("access_token"))
+context_in = LocalProxy(_turn_local("context_in"))
+context_manager = LocalProxy(lambda: _current_assistant().context_manager)
+convert_errors = LocalProxy(_turn_local("convert_errors"))
+session_id = LocalProxy(_turn_local("session_id"))
+user = LocalProxy(lambda: _current_assistant().user)
+storage = LocalProxy(lambda: _current_assistant().storage)
+profile = LocalProxy(lambda: _current_assistant().profile)
+
+
+# Flask only runs async views with asgiref installed, from the "async" extra
+_has_asgiref = importlib.util.find_spec("asgiref") is not None
+
+
+@contextmanager
+def _nullcontext():
+    yield
+
+
+def _lambda_response(status, body):
+    return {
+        "statusCode": status,
+        "headers": {"Content-Type": "application/json"},
+        "body": body,
+    }
 
 
 class Assistant(object):
@@ -69,6 +129,21 @@ class Assistant(object):
         client_id {Str} -- Actions on Google client ID used for account linking
         dev_token {str} - Dialogflow dev access token used to register and retrieve agent resources
         client_token {str} - Dialogflow client access token required for querying agent
+        json_codec {str or object} - JSON codec used to parse requests and render responses,
+                                     "orjson", "json" or an object providing loads and dumps
+                                     (default: orjson if installed, otherwise the json module)
+        log_sample_rate {int} - log the request and result summaries of one in every
+                                log_sample_rate turns (default: 1)
+        background_logging {bool} - format and write flask_assistant log records
+                                    from a background thread (default: False)
+        token_cache_size {int} - number of verified ID tokens whose profiles are kept,
+                                 0 verifies the token on every turn (default: 1024)
+        token_cache_max_age {int} - seconds a verified token is trusted before it is
+                                    verified again, at most until it expires
+                                    (default: until the token expires)
+        storage_codec {str or object} - codec of the userStorage sent to Actions on Google,
+                                        "json", "zlib" to compress it, or an object providing
+                                        loads and dumps (default: "json")
     """
 
     def __init__(
@@ -80,6 +155,12 @@ class Assistant(object):
         dev_token=None,
         client_token=None,
         client_id=None,
+        json_codec=None,
+        log_sample_rate=1,
+        background_logging=False,
+        token_cache_size=1024,
+        token_cache_max_age=None,
+        storage_codec=None,
     ):
 
         self.app = app
@@ -87,6 +168,12 @@ class Assistant(object):
         self._route = route
         self.project_id = project_id
         self.client_id = client_id
+        self.json_codec = get_codec(json_codec)
+        self._turn_log = TurnLogger(logger, log_sample_rate)
+        if background_logging:
+            start_log_listener(logger)
+        self.token_cache = VerifiedTokenCache(token_cache_size, token_cache_max_age)
+        self.storage_codec = get_storage_codec(storage_codec)
         self._intent_action_funcs = {}
         self._intent_mappings = {}
         self._intent_converts = {}
@@ -97,8 +184,11 @@ class Assistant(object):
         self._required_contexts = {}
         self._context_funcs = {}
         self._func_contexts = {}
+        self._dispatch = None
 
-        self.api = ApiAi(dev_token, client_token)
+        self._dev_token = dev_token
+        self._client_token = client_token
+        self._api = None
 
         if app is not None:
             self.init_app(app)
@@ -162,41 +252,97 @@ class Assistant(object):
         if self.client_id is None and self.app is not None:
             self.client_id = self.app.config.get("AOG_CLIENT_ID")
 
+    @property
+    def api(self):
+        """The :class:`api_ai.api.ApiAi` client of the Dialogflow management API.
+
+        It is created on first use, as most webhooks never manage their agent.
+        """
+        if self._api is None:
+            from api_ai.api import ApiAi
+
+            self._api = ApiAi(self._dev_token, self._client_token)
+        return self._api
+
+    @api.setter
+    def api(self, value):
+        self._api = value
+
+    @property
+    def _state(self):
+        """The :class:`TurnState` of the current turn.
+
+        Outside of a turn of this assistant, a detached state holding the defaults is returned.
+        """
+        state = _active_turn()
+        if state is None or state.assist is not self:
+            return TurnState(self)
+        return state
+
+    def _turn(self):
+        """Returns the state of the current turn to update, beginning a turn if needed"""
+        state = _active_turn()
+        if state is None or state.assist is not self:
+            state = self._begin_turn()
+        return state
+
+    def _begin_turn(self):
+        # only reached when state is assigned outside of a webhook turn, the
+        # state is then scoped to the application context as a turn's would be
+        state = TurnState(self)
+        if has_app_context():
+            g._assist_turn = state
+        else:
+            current_turn.set(state)
+        return state
+
+    @contextmanager
+    def _turn_scope(self):
+        """Holds a fresh :class:`TurnState` for the duration of a webhook turn"""
+        state = TurnState(self)
+        token = current_turn.set(state)
+        if has_app_context():
+            g._assist_turn = state
+        try:
+            yield
+        finally:
+            current_turn.reset(token)
+
     @property
     def request(self):
         """Local Proxy refering to the request JSON recieved from Dialogflow"""
-        return getattr(_app_ctx_stack.top, "_assist_request", None)
+        return self._state.request
 
     @request.setter
     def request(self, value):
-        _app_ctx_stack.top._assist_request = value
+        self._turn().request = value
 
     @property
     def intent(self):
         """Local Proxy refering to the name of the intent contained in the Dialogflow request"""
-        return getattr(_app_ctx_stack.top, "_assist_intent", None)
+        return self._state.intent
 
     @intent.setter
     def intent(self, value):
-        _app_ctx_stack.top._assist_intent = value
+        self._turn().intent = value
 
     @property
     def access_token(self):
         """Local proxy referring to the OAuth token for linked accounts."""
-        return getattr(_app_ctx_stack.top, "_assist_access_token", None)
+        return self._state.access_token
 
     @access_token.setter
     def access_token(self, value):
-        _app_ctx_stack.top._assist_access_token = value
+        self._turn().access_token = value
 
     @property
     def context_in(self):
         """Local Proxy refering to context objects contained within current session"""
-        return getattr(_app_ctx_stack.top, "_assist_context_in", [])
+        return self._state.context_in
 
     @context_in.setter
     def context_in(self, value):
-        _app_ctx_stack.top._assist_context_in = value
+        self._turn().context_in = value
 
     @property
     def context_manager(self):
@@ -204,45 +350,68 @@ class Assistant(object):
 
         Interface for adding and accessing contexts and their parameters
         """
-        return getattr(
-            _app_ctx_stack.top, "_assist_context_manager", ContextManager(self)
-        )
+        state = self._state
+        if state.context_manager is None:
+            state.context_manager = ContextManager(self, state.context_in)
+        return state.context_manager
 
     @context_manager.setter
     def context_manager(self, value):
-        _app_ctx_stack.top._assist_context_manager = value
+        self._turn().context_manager = value
+
+    @property
+    def _log_turn(self):
+        """True if the current turn was selected to be logged"""
+        return self._state.log_turn
+
+    @_log_turn.setter
+    def _log_turn(self, value):
+        self._turn().log_turn = value
 
     @property
     def convert_errors(self):
-        return getattr(_app_ctx_stack.top, "_assistant_convert_errors", None)
+        return self._state.convert_errors
 
     @convert_errors.setter
     def convert_errors(self, value):
-        _app_ctx_stack.top._assistant_convert_errors = value
+        self._turn().convert_errors = value
 
     @property
     def session_id(self):
-        return getattr(_app_ctx_stack.top, "_assist_session_id", None)
+        return self._state.session_id
 
     @session_id.setter
     def session_id(self, value):
-        _app_ctx_stack.top._assist_session_id = value
+        self._turn().session_id = value
 
     @property
     def user(self):
-        return getattr(_app_ctx_stack.top, "_assist_user", {})
+        state = self._state
+        if not state.storage_decoded:
+            self._decode_user_storage(state)
+        return state.user
 
     @user.setter
     def user(self, value):
-        storage_data = value.get("userStorage", {})
-
-        if not isinstance(storage_data, dict):
-            storage_data = json.loads(storage_data)
-
-        value["userStorage"] = storage_data
+        # userStorage is kept as received until the user or storage is read
+        state = self._turn()
+        state.user = value
+        state.storage_decoded = False
+
+    def _decode_user_storage(self, state):
+        state.storage_decoded = True
+        storage_data = state.user.get("userStorage")
+
+        codec = self.storage_codec
+        if storage_data is None:
+            storage_data = UserStorage(codec=codec)
+        elif isinstance(storage_data, dict):
+            raw = codec.dumps(storage_data)
+            storage_data = UserStorage(storage_data, raw=raw, codec=codec)
+        else:
+            storage_data = UserStorage.decode(storage_data, codec)
 
-        _app_ctx_stack.top._assist_user = value
-        _app_ctx_stack.top._assist_storage = storage_data
+        state.user["userStorage"] = storage_data
 
     @property
     def storage(self):
@@ -253,15 +422,21 @@ class Assistant(object):
         if not isinstance(value, dict):
             raise TypeError("Storage must be a dictionary")
 
-        self.user["userStorage"] = value
+        storage_data = UserStorage(value, codec=self.storage_codec)
+        storage_data.mark_changed()
+        self.user["userStorage"] = storage_data
 
     @property
     def profile(self):
-        return getattr(_app_ctx_stack.top, "_assist_profile", None)
+        state = self._state
+        if state.profile_pending:
+            state.profile_pending = False
+            self._set_user_profile()
+        return state.profile
 
     @profile.setter
     def profile(self, value):
-        _app_ctx_stack.top._assist_profile = value
+        self._turn().profile = value
 
     def _register_context_to_func(self, intent_name, context=[]):
         required = self._required_contexts.get(intent_name)
@@ -279,6 +454,7 @@ class Assistant(object):
                 self._func_contexts[f] = []
 
             self._func_contexts[f].extend(context_names)
+            self._dispatch = None
 
             def wrapper(*args, **kw):
                 return f(*args, with_context=context_names, **kw)
@@ -301,8 +477,8 @@ class Assistant(object):
     ):
         """Decorates an intent_name's Action view function.
 
-            The wrapped function is called when a request with the
-            given intent_name is recieved along with all required parameters.
+        The wrapped function is called when a request with the
+        given intent_name is recieved along with all required parameters.
         """
 
         def decorator(f):
@@ -316,6 +492,7 @@ class Assistant(object):
             self._intent_fallbacks[intent_name] = is_fallback
             self._intent_events[intent_name] = events
             self._register_context_to_func(intent_name, with_context)
+            self._dispatch = None
 
             @wraps(f)
             def wrapper(*args, **kw):
@@ -343,6 +520,7 @@ class Assistant(object):
             else:
                 self._intent_prompts[intent_name] = {}
                 self._intent_prompts[intent_name][next_param] = f
+            self._dispatch = None
 
             @wraps(f)
             def wrapper(*args, **kw):
@@ -352,18 +530,42 @@ class Assistant(object):
 
         return decorator
 
+    def compile(self):
+        """Builds the dispatch table used to match requests to view functions.
+
+        The table is built lazily on the first request and rebuilt whenever
+        :func:`action`, :func:`prompt_for` or :func:`context` register a new view,
+        so calling this is only needed to move the work out of the first request.
+
+        Returns:
+            dict -- intent names mapped to their compiled dispatch entries
+        """
+        self._dispatch = compile_dispatch(self)
+        return self._dispatch
+
+    @property
+    def _dispatch_table(self):
+        dispatch = self._dispatch
+        if dispatch is None:
+            dispatch = self.compile()
+        return dispatch
+
     def fallback(self):
         def decorator(f):
             self._fallback_response = f
             return f
 
     def _dialogflow_request(self, verify=True):
-        raw_body = flask_request.data
-        _dialogflow_request_payload = json.loads(raw_body)
+        raw_body = flask_request.get_data()
+        _dialogflow_request_payload = self.json_codec.loads(raw_body)
 
         return _dialogflow_request_payload
 
-    def _dump_request(self,):
+    def _dump_request(
+        self,
+    ):
+        if not self._turn_log.enabled(logging.INFO, self._log_turn):
+            return
         summary = {
             "Intent": self.intent,
             "Incoming Contexts": [c.name for c in self.context_manager.active],
@@ -371,18 +573,18 @@ class Assistant(object):
             "Missing Params": self._missing_params,
             "Received Params": self.request["queryResult"]["parameters"],
         }
-        msg = "Request: " + json.dumps(summary, indent=2, sort_keys=True)
-        logger.info(msg)
+        self._turn_log.log(logging.INFO, "Request", summary)
 
     def _dump_result(self, view_func, result):
+        if not self._turn_log.enabled(logging.INFO, self._log_turn):
+            return
         summary = {
             "Intent": self.intent,
             "Outgoing Contexts": [c.name for c in self.context_manager.active],
             "Matched Action": view_func.__name__,
             "Response Speech": result._speech,
         }
-        msg = "Result: " + json.dumps(summary, indent=2, sort_keys=True)
-        logger.info(msg)
+        self._turn_log.log(logging.INFO, "Result", summary)
 
     def _parse_session_id(self):
         return self.request["session"].split("/sessions/")[1]
@@ -391,27 +593,210 @@ class Assistant(object):
         if self.client_id is None:
             return
 
-        if self.user.get("idToken") is not None:
-            from flask_assistant.utils import decode_token
-
-            token = self.user["idToken"]
-            decode_resp = decode_token(token, self.client_id)
-            if decode_resp["status"] == "BAD":
-                return
-            else:  # decode_resp["status"]=="OK"
-                profile_payload = decode_resp["output"]
-            for k in ["sub", "iss", "aud", "iat", "exp"]:
-                profile_payload.pop(k)
+        user = self._state.user
+        if user.get("idToken") is not None:
+            token = user["idToken"]
+            profile_payload = self.token_cache.get(token)
+            if profile_payload is None:
+                from flask_assistant.utils import decode_token
+
+                decode_resp = decode_token(token, self.client_id)
+                if decode_resp["status"] == "BAD":
+                    return
+                else:  # decode_resp["status"]=="OK"
+                    profile_payload = decode_resp["output"]
+                for k in ["sub", "iss", "aud", "iat"]:
+                    profile_payload.pop(k)
+                self.token_cache.put(token, profile_payload, profile_payload.pop("exp"))
 
             self.profile = profile_payload
 
     def _flask_assitant_view_func(self, nlp_result=None, *args, **kwargs):
         if nlp_result:  # pass API query result directly
-            self.request = nlp_result
+            request_json = nlp_result
         else:  # called as webhook
-            self.request = self._dialogflow_request(verify=False)
+            request_json = self._dialogflow_request(verify=False)
 
-        logger.debug(json.dumps(self.request, indent=2))
+        result = self._fulfill_sync(
+            request_json, lambda response: response.render_response(self.json_codec)
+        )
+        if result is None:
+            return "", 400
+        return result
+
+    def _fulfill_sync(self, request_json, render):
+        """Fulfills a request in a turn of its own, waiting for ``async def`` views.
+
+        Arguments:
+            request_json {dict} -- WebhookRequest JSON received from Dialogflow
+            render {callable} -- renders the response object returned by the view,
+                                 called before the turn's state is reset
+
+        Returns:
+            The rendered response, or the view's return value if it is not a response
+            object. None if no view was matched or the view returned nothing.
+        """
+        with self._turn_scope():
+            view = self._start_turn(request_json)
+            if view is None:
+                return None
+
+            result = self._map_intent_to_view_func(view)()
+            if inspect.isawaitable(result):
+                result = self._run_coroutine(result)
+            return self._finish_turn(view, result, render)
+
+    def _finish_turn(self, view, result, render):
+        """Logs and renders the result of the view, returns None if it is empty"""
+        if result is None:
+            logger.error("Action func returned empty response")
+            return None
+
+        if isinstance(result, _Response):
+            self._dump_result(view.func, result)
+            return render(result)
+        return result
+
+    async def fulfill(self, request_json):
+        """Fulfills a Dialogflow webhook request from within a running event loop.
+
+        Entry point for serving the webhook with asyncio instead of a Flask route.
+        ``async def`` action and prompt functions are awaited directly,
+        so a single event loop can keep many slow fulfillments in flight at once.
+        Synchronous functions are called as usual.
+
+        An application context is pushed for the duration of the request
+        if one is not already active. No Flask request context is required.
+
+        Arguments:
+            request_json {dict} -- WebhookRequest JSON received from Dialogflow
+
+        Returns:
+            dict -- The WebhookResponse JSON, or the action function's return value
+                    if it is not a response object. None if no action function was
+                    matched or the matched function returned nothing.
+        """
+        with self._app_context(), self._turn_scope():
+            view = self._start_turn(request_json)
+            if view is None:
+                return None
+
+            result = self._map_intent_to_view_func(view)()
+            if inspect.isawaitable(result):
+                result = await result
+            return self._finish_turn(view, result, _Response._render)
+
+    async def asgi_app(self, scope, receive, send):
+        """ASGI application serving the webhook without Flask's request handling.
+
+        Dialogflow WebhookRequest POSTs are fulfilled with :meth:`fulfill`,
+        so ``async def`` action functions run on the server's event loop.
+        The application answers every path it is mounted on.
+
+        Example usage:
+
+            # uvicorn webhook:asgi_app
+            from flask import Flask
+            from flask_assistant import Assistant
+
+            app = Flask(__name__)
+            assist = Assistant(app, project_id="my-project")
+            asgi_app = assist.asgi_app
+        """
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    self.compile()
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+
+        if scope["type"] != "http":
+            raise ValueError("Unsupported ASGI scope type: {}".format(scope["type"]))
+
+        if scope["method"] != "POST":
+            await self._asgi_respond(send, 405, b"")
+            return
+
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+
+        try:
+            request_json = self.json_codec.loads(b"".join(chunks))
+        except ValueError:
+            logger.error("Webhook request body is not valid JSON")
+            await self._asgi_respond(send, 400, b"")
+            return
+
+        result = await self.fulfill(request_json)
+        if result is None:
+            await self._asgi_respond(send, 400, b"")
+            return
+
+        if isinstance(result, str):
+            body = result.encode("utf-8")
+        elif isinstance(result, bytes):
+            body = result
+        else:
+            body = self.json_codec.dumps(result)
+        await self._asgi_respond(send, 200, body)
+
+    async def _asgi_respond(self, send, status, body):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("latin-1")),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    def _app_context(self):
+        if has_app_context():
+            return _nullcontext()
+        if self.app is None:
+            raise RuntimeError(
+                "An application context is required to fulfill requests "
+                "for an Assistant initialized with a blueprint"
+            )
+        return self.app.app_context()
+
+    def _run_coroutine(self, awaitable):
+        """Waits for the result of an ``async def`` view function from a synchronous view"""
+        ensure_sync = getattr(current_app, "ensure_sync", None)
+        if ensure_sync is not None and _has_asgiref:  # Flask >= 2.0 async views
+
+            async def wait():
+                return await awaitable
+
+            return ensure_sync(wait)()
+
+        import asyncio
+
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(awaitable)
+        finally:
+            loop.close()
+
+    def _start_turn(self, request_json):
+        """Sets up the state of the current turn and returns the matched view, or None"""
+        self.request = request_json
+        self._log_turn = self._turn_log.sample()
+
+        if self._turn_log.enabled(logging.DEBUG, self._log_turn):
+            logger.debug("Request JSON: %s", LazyJSON(self.request))
 
         try:
             self.intent = self.request["queryResult"]["intent"]["displayName"]
@@ -424,82 +809,64 @@ class Assistant(object):
                 please update to V2 in the Dialogflow console."""
             )
 
-        # update context_manager's assist reference
-        # TODO: acces context_manager from assist, instead of own object
-        self.context_manager._assist = self
-
         original_request = self.request.get("originalDetectIntentRequest")
 
         if original_request:
             payload = original_request.get("payload")
             if payload and payload.get("user"):
                 self.user = original_request["payload"]["user"]
-                self._set_user_profile()
+                # the ID token is verified when the profile is first read
+                self._turn().profile_pending = self.client_id is not None
 
         # Get access token from request
         if original_request and original_request.get("user"):
             self.access_token = original_request["user"].get("accessToken")
 
-        self._update_contexts()
         self._dump_request()
 
-        view_func = self._match_view_func()
-        if view_func is None:
+        view = self._match_view_func()
+        if view is None:
             logger.error("Failed to match an action function")
-            return "", 400
-
-        logger.info("Matched action function: {}".format(view_func.__name__))
-        result = self._map_intent_to_view_func(view_func)()
-
-        if result is not None:
-            if isinstance(result, _Response):
-                self._dump_result(view_func, result)
-                resp = result.render_response()
-                return resp
-            return result
-        logger.error("Action func returned empty response")
-        return "", 400
+            return None
 
-    def _update_contexts(self):
-        temp = self.context_manager
-        temp.update(self.context_in)
-        self.context_manager = temp
+        logger.info("Matched action function: %s", view.func.__name__)
+        return view
 
     def _match_view_func(self):
-        view_func = None
+        """Returns the compiled view of the action or prompt function to call"""
+        view = None
 
-        intent_actions = self._intent_action_funcs.get(self.intent, [])
-        if len(intent_actions) == 0:
+        dispatch = self._dispatch_table.get(self.intent)
+        if dispatch is None or len(dispatch.actions) == 0:
             logger.critical(
                 "No action funcs defined for intent: {}".format(self.intent)
             )
-            return view_func
+            return view
 
-        if self.has_live_context():
-            view_func = self._choose_context_view()
+        if dispatch.context_views and self.has_live_context():
+            view = self._choose_context_view(dispatch)
 
-        if not view_func and self._missing_params:
-            prompts = self._intent_prompts.get(self.intent)
-            if prompts:
-                param_choice = self._missing_params.pop()
-                view_func = prompts.get(param_choice)
+        if not view and self._missing_params:
+            param_choice = self._missing_params.pop()
+            view = dispatch.prompts.get(param_choice)
+            if view:
                 logger.debug(
-                    "Matching prompt func {} for missing param {}".format(
-                        view_func.__name__, param_choice
-                    )
+                    "Matching prompt func %s for missing param %s",
+                    view.func.__name__,
+                    param_choice,
                 )
 
-        if not view_func and len(intent_actions) == 1:
-            view_func = self._intent_action_funcs[self.intent][0]
+        if not view and len(dispatch.actions) == 1:
+            view = dispatch.actions[0]
 
         # TODO: Do not match func if context not satisfied
 
-        if not view_func and len(intent_actions) > 1:
-            view_func = intent_actions[0]
+        if not view and len(dispatch.actions) > 1:
+            view = dispatch.actions[0]
             msg = "Multiple actions defined but no context was applied, will use first action func"
             logger.warning(msg)
 
-        return view_func
+        return view
 
     def has_live_context(self):
         for context in self.context_in:
@@ -516,6 +883,10 @@ class Assistant(object):
         a Flask Assistant application, which should be used as the return value
         to the AWS Lambda handler function ready for API Gateway.
         From Flask Ask and adjusted for Flask Assistant
+
+        :meth:`lambda_handler` fulfills events without emulating WSGI,
+        use it when the Flask request hooks of the application are not needed.
+
         Example usage:
             from flask import Flask
             from flask_assistant import Assistant, ask
@@ -560,10 +931,10 @@ class Assistant(object):
 
         # Convert the event provided by the AWS Lambda handler to a JSON
         # string that can be read as the body of a HTTP POST request.
-        body = event["body"]
+        body = event["body"].encode("utf-8")
         environ["CONTENT_TYPE"] = "application/json"
-        environ["CONTENT_LENGTH"] = len(body)
-        environ["wsgi.input"] = StringIO(body)
+        environ["CONTENT_LENGTH"] = str(len(body))
+        environ["wsgi.input"] = BytesIO(body)
 
         # Start response is a required callback that must be passed when
         # the application is invoked. It is used to set HTTP status and
@@ -601,49 +972,80 @@ class Assistant(object):
             if hasattr(result, "close"):
                 result.close()
 
-    def _context_satified(self, view_func):
-        met = []
+    def lambda_handler(self, event, context=None):
+        """AWS Lambda handler fulfilling API Gateway proxy events directly.
 
-        required_names = list(self._func_contexts[view_func])
-        recieved_context_names = [parse_context_name(c) for c in self.context_in]
+        Unlike :meth:`run_aws_lambda`, no WSGI environ is built and Flask's request
+        handling is skipped. The event body is parsed once, matched and fulfilled
+        within an application context, and the response is serialized once into
+        the returned body. Flask request hooks are not run.
 
-        for req_context in required_names:
-            if req_context in recieved_context_names:
-                met.append(req_context)
+        The dispatch table is compiled on the first invocation and reused by the
+        following ones while the container stays warm. Calling :meth:`compile`
+        at module level moves that work to the container's initialization.
 
-        if set(met) == set(required_names):
-            if len(required_names) <= len(recieved_context_names):
-                return True
+        Example usage:
+            from flask import Flask
+            from flask_assistant import Assistant, ask
 
-    @property
-    def _context_views(self):
-        """Returns view functions for which the context requirements are met"""
-        possible_views = []
-
-        for func in self._func_contexts:
-            if self._context_satified(func):
-                logger.debug("{} context conditions satisified".format(func.__name__))
-                possible_views.append(func)
-        return possible_views
-
-    def _choose_context_view(self):
-        choice = None
-        for view in self._context_views:
-            if view in self._intent_action_funcs[self.intent]:
-                logger.debug(
-                    "Matched {} based on active contexts".format(view.__name__)
-                )
-                choice = view
-        if choice:
-            return choice
+            app = Flask(__name__)
+            assist = Assistant(app, project_id="my-project")
+
+
+            @assist.action('greetings')
+            def greet_and_start():
+                return ask("Hey! Are you male or female?")
+
+
+            assist.compile()
+            lambda_handler = assist.lambda_handler
+
+        Arguments:
+            event {dict} -- API Gateway proxy event carrying the WebhookRequest as its body
+
+        Keyword Arguments:
+            context {object} -- the Lambda context object, unused (default: {None})
+
+        Returns:
+            dict -- the API Gateway response, with the serialized WebhookResponse as its body
+        """
+        body = event.get("body") or ""
+        if event.get("isBase64Encoded"):
+            body = base64.b64decode(body)
+
+        try:
+            request_json = self.json_codec.loads(body)
+        except ValueError:
+            logger.error("Webhook request body is not valid JSON")
+            return _lambda_response(400, "")
+
+        with self._app_context():
+            result = self._fulfill_sync(request_json, _Response._render)
+        if result is None:
+            return _lambda_response(400, "")
+
+        if isinstance(result, bytes):
+            body = result.decode("utf-8")
+        elif isinstance(result, str):
+            body = result
         else:
-            active_contexts = [c.name for c in self.context_manager.active]
-            intent_actions = [
-                f.__name__ for f in self._intent_action_funcs[self.intent]
-            ]
-            msg = "No {} action func matched based on active contexts"
+            body = self.json_codec.dumps(result)
+            if isinstance(body, bytes):
+                body = body.decode("utf-8")
+        return _lambda_response(200, body)
+
+    def _choose_context_view(self, dispatch):
+        """Returns the last registered context view whose required contexts were received"""
+        recieved = self._dispatch_table.context_mask(
+            parse_context_name(c) for c in self.context_in
+        )
 
-            logger.debug(msg)
+        for view in reversed(dispatch.context_views):
+            if view.context_mask & ~recieved == 0:
+                logger.debug("Matched %s based on active contexts", view.func.__name__)
+                return view
+
+        logger.debug("No %s action func matched based on active contexts", self.intent)
 
     @property
     def _missing_params(self):  # TODO: fill missing slot from default\
@@ -656,47 +1058,26 @@ class Assistant(object):
 
         return missing
 
-    def _func_args(self, f):
-        try:
-            argspec = inspect.getfullargspec(f)
-
-        except AttributeError:  # for python2
-            argspec = inspect.getargspec(f)
-
-        return argspec.args
-
-    def _map_intent_to_view_func(self, view_func):
-        arg_names = self._func_args(view_func)
-        arg_values = self._map_params_to_view_args(arg_names)
-        return partial(view_func, *arg_values)
+    def _map_intent_to_view_func(self, view):
+        arg_values = self._map_params_to_view_args(view)
+        return partial(view.func, *arg_values)
 
-    def _map_params_to_view_args(self, arg_names):  # TODO map to correct name
+    def _map_params_to_view_args(self, view):
         arg_values = []
-        mapping = self._intent_mappings.get(self.intent)
-        convert = self._intent_converts.get(self.intent)
         params = self.request["queryResult"]["parameters"]
 
         convert_errors = {}
 
-        for arg_name in arg_names:
-            entity_mapping = mapping.get(arg_name, arg_name)
-            # param name cant have '.',
-            # so when registered, the sys. is stripped,
-            # and must be stripped when looking up in request
-            mapped_param_name = entity_mapping.replace("sys.", "")
-            value = params.get(
-                mapped_param_name
-            )  # params declared in GUI present in request
+        for arg_name, param_name, convert_func in zip(
+            view.arg_names, view.param_names, view.converters
+        ):
+            # params declared in GUI present in request
+            value = params.get(param_name)
 
             if not value:  # params not declared, so must look in contexts
                 value = self._map_arg_from_context(arg_name)
-            elif arg_name in convert:
+            elif convert_func is not None:
                 # Apply parameter conversion
-                shorthand_or_function = convert[arg_name]
-                if shorthand_or_function in _converter_shorthands:
-                    convert_func = _converter_shorthands[shorthand_or_function]
-                else:
-                    convert_func = shorthand_or_function
                 try:
                     value = convert_func(value)
                 except Exception as exc:
@@ -710,8 +1091,8 @@ class Assistant(object):
         for context_obj in self.context_in:
             if arg_name in context_obj["parameters"]:
                 logger.debug(
-                    "Retrieved {} param value from {} context".format(
-                        arg_name, context_obj["name"]
-                    )
+                    "Retrieved %s param value from %s context",
+                    arg_name,
+                    context_obj["name"],
                 )
                 return context_obj["parameters"][arg_name]
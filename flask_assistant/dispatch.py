@@ -0,0 +1,172 @@
+"""Compiled dispatch tables mapping intents to their view functions.
+
+The :class:`Assistant` registries filled by the ``action``, ``prompt_for`` and
+``context`` decorators are the source of truth. Everything a webhook request
+needs from them that does not change between requests (argument names,
+resolved parameter names, converter callables, required contexts) is resolved
+once here, so that matching a request is a handful of dict lookups.
+"""
+
+import inspect
+from collections import namedtuple
+
+import aniso8601
+
+# Converter shorthands for commonly used system entities
+_converter_shorthands = {
+    "date": aniso8601.parse_date,  # Returns date
+    "date-period": aniso8601.parse_interval,  # Returns (date, date)
+    "time": aniso8601.parse_time,  # Returns time
+}
+
+
+ViewSpec = namedtuple(
+    "ViewSpec",
+    [
+        "func",
+        "arg_names",
+        "param_names",
+        "converters",
+        "required_contexts",
+        "context_mask",
+        "is_async",
+    ],
+)
+ViewSpec.__doc__ = """A view function with its request mapping resolved.
+
+    func -- the decorated view function
+    arg_names -- names of the function's positional arguments
+    param_names -- request parameter name looked up for each argument
+    converters -- conversion callable for each argument, or None
+    required_contexts -- frozenset of context names required by @context, or None
+    context_mask -- bitmask of the interned ids of required_contexts
+    is_async -- True if func is an ``async def`` coroutine function
+"""
+
+
+IntentDispatch = namedtuple(
+    "IntentDispatch", ["name", "actions", "prompts", "context_views"]
+)
+IntentDispatch.__doc__ = """Compiled dispatch entry for a single intent.
+
+    name -- the intent's display name
+    actions -- tuple of ViewSpec, in registration order
+    prompts -- dict mapping a missing parameter name to its prompt ViewSpec
+    context_views -- tuple of action ViewSpec with required contexts,
+                     in the order their contexts were registered
+"""
+
+
+class DispatchTable(dict):
+    """Intent names mapped to their :class:`IntentDispatch` entries.
+
+    Every context name required by a view is interned to a single bit,
+    so checking a view's requirements against the received contexts is
+    one integer operation instead of a scan over both lists of names.
+    """
+
+    def __init__(self, context_ids=None):
+        super(DispatchTable, self).__init__()
+        self.context_ids = context_ids if context_ids is not None else {}
+
+    def intern_contexts(self, context_names):
+        """Returns the bitmask of context_names, assigning ids to unseen names"""
+        mask = 0
+        for name in context_names:
+            bit = self.context_ids.get(name)
+            if bit is None:
+                bit = self.context_ids[name] = 1 << len(self.context_ids)
+            mask |= bit
+        return mask
+
+    def context_mask(self, context_names):
+        """Returns the bitmask of the context_names required by any view.
+
+        Names no view requires are ignored, as they cannot satisfy a requirement.
+        """
+        context_ids = self.context_ids
+        mask = 0
+        for name in context_names:
+            mask |= context_ids.get(name, 0)
+        return mask
+
+
+def view_args(f):
+    try:
+        argspec = inspect.getfullargspec(f)
+
+    except AttributeError:  # for python2
+        argspec = inspect.getargspec(f)
+
+    return argspec.args
+
+
+def resolve_converter(shorthand_or_function):
+    if shorthand_or_function in _converter_shorthands:
+        return _converter_shorthands[shorthand_or_function]
+    return shorthand_or_function
+
+
+def compile_view(f, mapping, convert, required_contexts=None, table=None):
+    """Resolves the argument mapping of a view function into a :class:`ViewSpec`"""
+    arg_names = tuple(view_args(f))
+    param_names = []
+    converters = []
+
+    for arg_name in arg_names:
+        entity_mapping = mapping.get(arg_name, arg_name)
+        # param name cant have '.',
+        # so when registered, the sys. is stripped,
+        # and must be stripped when looking up in request
+        param_names.append(entity_mapping.replace("sys.", ""))
+
+        if arg_name in convert:
+            converters.append(resolve_converter(convert[arg_name]))
+        else:
+            converters.append(None)
+
+    context_mask = 0
+    if required_contexts is not None:
+        required_contexts = frozenset(required_contexts)
+        if table is not None:
+            context_mask = table.intern_contexts(sorted(required_contexts))
+
+    return ViewSpec(
+        f,
+        arg_names,
+        tuple(param_names),
+        tuple(converters),
+        required_contexts,
+        context_mask,
+        inspect.iscoroutinefunction(f),
+    )
+
+
+def compile_intent(assist, intent_name, table=None):
+    """Builds the :class:`IntentDispatch` entry for a registered intent"""
+    mapping = assist._intent_mappings.get(intent_name) or {}
+    convert = assist._intent_converts.get(intent_name) or {}
+
+    actions = tuple(
+        compile_view(f, mapping, convert, assist._func_contexts.get(f), table)
+        for f in assist._intent_action_funcs.get(intent_name, [])
+    )
+
+    prompts = {
+        param: compile_view(f, mapping, convert)
+        for param, f in assist._intent_prompts.get(intent_name, {}).items()
+    }
+
+    # views are considered in the order their contexts were registered
+    by_func = {view.func: view for view in actions}
+    context_views = tuple(by_func[f] for f in assist._func_contexts if f in by_func)
+
+    return IntentDispatch(intent_name, actions, prompts, context_views)
+
+
+def compile_dispatch(assist):
+    """Returns a :class:`DispatchTable` of every intent registered with the assistant"""
+    table = DispatchTable()
+    for intent_name in assist._intent_action_funcs:
+        table[intent_name] = compile_intent(assist, intent_name, table)
+    return table
@@ -11,11 +11,22 @@ class Context(dict):
 
     def __init__(self, name, parameters={}, lifespan=5):
 
+        self._manager = None
         self.name = name
         self.parameters = parameters
         self.lifespan = lifespan
         self._full_name = None
 
+    @property
+    def lifespan(self):
+        return self._lifespan
+
+    @lifespan.setter
+    def lifespan(self, value):
+        self._lifespan = value
+        if self._manager is not None:
+            self._manager._track(self)
+
     # def __getattr__(self, param):
     #     if param in ['name', 'parameters', 'lifespan']:
     #         return getattr(self, param)
@@ -43,9 +54,27 @@ class Context(dict):
 
 
 class ContextManager:
-    def __init__(self, assist):
+    """Interface for adding and accessing the contexts of the current turn.
+
+    The contexts received with the request are parsed on first access,
+    and the active and expired contexts are tracked as their lifespans change.
+    """
+
+    def __init__(self, assist, contexts_json=None):
         self._assist = assist
-        self._cache = {}
+        self._contexts = {}
+        self._pending = contexts_json
+        self._active = {}
+        self._expired = {}
+        self._active_view = None
+        self._expired_view = None
+
+    @property
+    def _cache(self):
+        if self._pending:
+            pending, self._pending = self._pending, None
+            self.update(pending)
+        return self._contexts
 
     @property
     def _project_id(self):
@@ -60,10 +89,41 @@ class ContextManager:
             self._project_id, self._session_id, short_name
         )
 
+    def _store(self, context):
+        previous = self._cache.get(context.name)
+        if previous is not None and previous is not context:
+            previous._manager = None
+
+        self._contexts[context.name] = context
+        context._manager = self
+        self._track(context)
+
+    def _track(self, context):
+        """Files the context under the active or expired view matching its lifespan"""
+        name = context.name
+        if context.lifespan > 0:
+            target = self._active
+        elif context.lifespan == 0:
+            target = self._expired
+        else:
+            target = None
+
+        if target is not self._active and self._active.pop(name, None) is not None:
+            self._active_view = None
+        if target is not self._expired and self._expired.pop(name, None) is not None:
+            self._expired_view = None
+
+        if target is not None and target.get(name) is not context:
+            target[name] = context
+            if target is self._active:
+                self._active_view = None
+            else:
+                self._expired_view = None
+
     def add(self, *args, **kwargs):
         context = Context(*args, **kwargs)
         context._full_name = self.build_full_name(context.name)
-        self._cache[context.name] = context
+        self._store(context)
         return context
 
     def get(self, context_name, default=None):
@@ -72,7 +132,6 @@ class ContextManager:
     def set(self, context_name, param, val):
         context = self.get(context_name)
         context.set(param, val)
-        self._cache[context.name] = context
         return context
 
     def get_param(self, context_name, param):
@@ -85,16 +144,12 @@ class ContextManager:
             context._full_name = obj["name"]
             context.lifespan = obj.get("lifespanCount", 0)
             context.parameters = obj.get("parameters", {})
-            self._cache[context.name] = context
+            self._store(context)
 
     def clear_all(self):
         logger.info("Clearing all contexts")
-        new_cache = {}
-        for name, context in self._cache.items():
+        for context in list(self._cache.values()):
             context.lifespan = 0
-            new_cache[name] = context
-
-        self._cache = new_cache
 
     @property
     def status(self):
@@ -102,8 +157,16 @@ class ContextManager:
 
     @property
     def active(self):
-        return [self._cache[c] for c in self._cache if self._cache[c].lifespan > 0]
+        """Tuple of the contexts with a lifespan left, shared until they change"""
+        self._cache  # parse the received contexts
+        if self._active_view is None:
+            self._active_view = tuple(self._active.values())
+        return self._active_view
 
     @property
     def expired(self):
-        return [self._cache[c] for c in self._cache if self._cache[c].lifespan == 0]
+        """Tuple of the contexts whose lifespan is over, shared until they change"""
+        self._cache  # parse the received contexts
+        if self._expired_view is None:
+            self._expired_view = tuple(self._expired.values())
+        return self._expired_view
@@ -1,3 +1,6 @@
+from flask_assistant.response.renderer import Renderer, register_renderer
+
+
 def build_card(
     text,
     title,
@@ -23,3 +26,85 @@ def build_card(
         card_payload["image"] = img_payload
 
     return {"platform": "ACTIONS_ON_GOOGLE", "basicCard": card_payload}
+
+
+@register_renderer
+class ActionsRenderer(Renderer):
+    """Renders responses for Actions on Google.
+
+    Speech and cards are only rendered with ACTIONS_ON_GOOGLE in INTEGRATIONS,
+    suggestions, media, lists and carousels are always rendered.
+    """
+
+    platform = "ACTIONS_ON_GOOGLE"
+    order = 10
+
+    def speech(self, speech, display_text, is_ssml):
+        if not self.integrated:
+            return
+
+        if display_text is None:
+            display_text = speech
+
+        if is_ssml:
+            ssml_speech = "<speak>" + speech + "</speak>"
+            simple_response = {"ssml": ssml_speech, "displayText": display_text}
+        else:
+            simple_response = {"textToSpeech": speech, "displayText": display_text}
+
+        self.messages.append(
+            {
+                "platform": "ACTIONS_ON_GOOGLE",
+                "simpleResponses": {"simpleResponses": [simple_response]},
+            }
+        )
+
+    def chips(self, replies):
+        chips = [{"title": r} for r in replies]
+        self.messages.append(
+            {"platform": "ACTIONS_ON_GOOGLE", "suggestions": {"suggestions": chips}}
+        )
+
+    def link_out(self, name, url):
+        self.messages.append(
+            {
+                "platform": "ACTIONS_ON_GOOGLE",
+                "linkOutSuggestion": {"destinationName": name, "uri": url},
+            }
+        )
+
+    def card(self, card):
+        if self.integrated:
+            self.messages.append(
+                build_card(
+                    card["text"],
+                    card["title"],
+                    card["img_url"],
+                    card["img_alt"],
+                    card["subtitle"],
+                    card["link"],
+                    card["link_title"],
+                    card["buttons"],
+                )
+            )
+
+    def media(self, media_object):
+        self.messages.append(
+            {
+                "platform": "ACTIONS_ON_GOOGLE",
+                "mediaContent": {"mediaObjects": [media_object], "mediaType": "AUDIO"},
+            }
+        )
+
+    def list(self, title, items):
+        self.messages.append(
+            {
+                "platform": "ACTIONS_ON_GOOGLE",
+                "listSelect": {"title": title, "items": items},
+            }
+        )
+
+    def carousel(self, items):
+        self.messages.append(
+            {"platform": "ACTIONS_ON_GOOGLE", "carouselSelect": {"items": items}}
+        )
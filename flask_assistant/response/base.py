@@ -1,18 +1,57 @@
-from flask import json, make_response, current_app
+import logging
+
+from flask import make_response, current_app
 from flask_assistant import logger
-from flask_assistant.response import actions, dialogflow, hangouts, df_messenger
+from flask_assistant.codec import default_codec
+from flask_assistant.turnlog import LazyJSON
+# importing the platform modules registers their renderers, they are not used otherwise
+from flask_assistant.response import (  # noqa: F401
+    actions,
+    dialogflow,
+    hangouts,
+    df_messenger,
+)
+from flask_assistant.response.renderer import registered_renderers
+
+# Dialogflow request sources of the platforms responses can be rendered for
+_SOURCE_PLATFORMS = {
+    "google": "ACTIONS_ON_GOOGLE",
+    "hangouts": "GOOGLE_HANGOUTS",
+    "dialogflow_messenger": "DIALOGFLOW_MESSENGER",
+}
+
+
+def _request_platforms():
+    """Returns the platforms the current request can be rendered on, None if any"""
+    from flask_assistant.core import _active_turn
+
+    state = _active_turn()
+    if state is None or not state.request:
+        return None
+    source = state.request.get("originalDetectIntentRequest", {}).get("source")
+    platform = _SOURCE_PLATFORMS.get(source)
+    if platform is None:
+        return None
+    return frozenset([platform])
 
 
 class _Response(object):
-    """Base webhook response to be returned to Dialogflow"""
+    """Base webhook response to be returned to Dialogflow.
+
+    The response elements added by its methods are recorded, and only turned
+    into platform messages when the response is rendered. Messages are built for
+    the platform named by the source of the request, or for every platform when
+    the source is unknown.
+    """
 
     def __init__(self, speech, display_text=None, is_ssml=False):
 
         self._speech = speech
         self._display_text = display_text
         self._integrations = current_app.config.get("INTEGRATIONS", [])
-        self._messages = [{"text": {"text": [speech]}}]
-        self._platform_messages = {}
+        self._platforms = _request_platforms()
+        self._elements = [("speech", speech, display_text, is_ssml)]
+        self._messages = []
         self._render_func = None
         self._is_ssml = is_ssml
         self._response = {
@@ -30,170 +69,108 @@ class _Response(object):
             "followupEventInput": None,  # TODO
         }
 
-        for i in self._integrations:
-            self._platform_messages[i] = []
-
-        if "ACTIONS_ON_GOOGLE" in self._integrations:
+        if self._renders_for("ACTIONS_ON_GOOGLE"):
             self._set_user_storage()
-            self._integrate_with_actions(self._speech, self._display_text, is_ssml)
 
-    def add_msg(self, speech, display_text=None, is_ssml=False):
-        self._messages.append({"text": {"text": [speech]}})
+    def _renders_for(self, platform, integration=True):
+        """True if messages are built for platform.
 
-        if "ACTIONS_ON_GOOGLE" in self._integrations:
-            self._integrate_with_actions(speech, display_text, is_ssml)
+        Arguments:
+            platform {str} -- name of the platform
+
+        Keyword Arguments:
+            integration {bool} -- whether the platform must be enabled in INTEGRATIONS
+                                  (default: {True})
+        """
+        if integration and platform not in self._integrations:
+            return False
+        return self._platforms is None or platform in self._platforms
 
+    def add_msg(self, speech, display_text=None, is_ssml=False):
+        self._elements.append(("speech", speech, display_text, is_ssml))
         return self
 
     def _set_user_storage(self):
-        from flask_assistant.core import user
+        from flask_assistant.core import _active_turn
+        from flask_assistant.storage import UserStorage
 
-        # If empty or unspecified,
+        state = _active_turn()
+        # Storage that was never read is unchanged. If empty or unspecified,
         # the existing persisted token will be unchanged.
-        user_storage = user.get("userStorage")
+        if state is None or not state.storage_decoded:
+            return
+
+        user_storage = state.user.get("userStorage")
         if user_storage is None:
             return
 
-        if isinstance(user_storage, dict):
-            user_storage = json.dumps(user_storage)
+        if isinstance(user_storage, UserStorage):
+            user_storage = user_storage.encode()
+            if user_storage is None:
+                return
+        elif isinstance(user_storage, dict):
+            user_storage = state.assist.storage_codec.dumps(user_storage)
 
         if len(user_storage.encode("utf-8")) > 10000:
             raise ValueError("UserStorage must not exceed 10k bytes")
 
         self._response["payload"]["google"]["userStorage"] = user_storage
 
-    def _integrate_with_df_messenger(self, speech=None, display_text=None):
-
-        logger.debug("Integrating with dialogflow messenger")
-
-        content = {"richContent": [[]]}
-        for m in self._platform_messages.get("DIALOGFLOW_MESSENGER", []):
-            content["richContent"][0].append(m)
-
-        payload = {"payload": content}
-
-        self._messages.append(payload)
-
-    def _integrate_with_hangouts(self, speech=None, display_text=None, is_ssml=False):
-        if display_text is None:
-            display_text = speech
-
-        self._messages.append(
-            {"platform": "GOOGLE_HANGOUTS", "text": {"text": [display_text]},}
-        )
-        for m in self._platform_messages.get("GOOGLE_HANGOUTS", []):
-            self._messages.append(m)
-
-    def _integrate_with_actions(self, speech=None, display_text=None, is_ssml=False):
-        if display_text is None:
-            display_text = speech
-
-        if is_ssml:
-            ssml_speech = "<speak>" + speech + "</speak>"
-            self._messages.append(
-                {
-                    "platform": "ACTIONS_ON_GOOGLE",
-                    "simpleResponses": {
-                        "simpleResponses": [
-                            {"ssml": ssml_speech, "displayText": display_text}
-                        ]
-                    },
-                }
-            )
-        else:
-            self._messages.append(
-                {
-                    "platform": "ACTIONS_ON_GOOGLE",
-                    "simpleResponses": {
-                        "simpleResponses": [
-                            {"textToSpeech": speech, "displayText": display_text}
-                        ]
-                    },
-                }
-            )
-
     def _include_contexts(self):
         from flask_assistant import core
 
         for context in core.context_manager.active:
             self._response["outputContexts"].append(context.serialize)
 
-    def render_response(self):
+    def _build_messages(self):
+        """Builds the messages of the recorded response elements"""
+        renderers = [
+            cls(self._messages, cls.platform in self._integrations)
+            for cls in registered_renderers()
+            if cls.platform is None
+            or self._renders_for(cls.platform, integration=False)
+        ]
+
+        for element in self._elements:
+            kind, args = element[0], element[1:]
+            for renderer in renderers:
+                getattr(renderer, kind)(*args)
+
+        for renderer in renderers:
+            renderer.finish(self._speech, self._display_text)
+
+    def _render(self):
+        """Completes the response and returns the WebhookResponse JSON as a dict"""
         self._include_contexts()
         if self._render_func:
             self._render_func()
 
-        self._integrate_with_df_messenger()
-        self._integrate_with_hangouts(self._speech, self._display_text)
-        logger.debug(json.dumps(self._response, indent=2))
-        resp = make_response(json.dumps(self._response))
+        self._build_messages()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Response JSON: %s", LazyJSON(self._response))
+        return self._response
+
+    def render_response(self, codec=None):
+        """Returns the Flask response object carrying the serialized WebhookResponse
+
+        Keyword Arguments:
+            codec {object} -- JSON codec to serialize the response with
+                              (default: {the fastest available codec})
+        """
+        codec = codec or default_codec
+        resp = make_response(codec.dumps(self._render()))
         resp.headers["Content-Type"] = "application/json"
 
         return resp
 
     def suggest(self, *replies):
         """Use suggestion chips to hint at responses to continue or pivot the conversation"""
-        chips = []
-        for r in replies:
-            chips.append({"title": r})
-
-        # native chips for GA
-        self._messages.append(
-            {"platform": "ACTIONS_ON_GOOGLE", "suggestions": {"suggestions": chips}}
-        )
-
-        if "DIALOGFLOW_MESSENGER" in self._integrations:
-            existing_chips = False
-            for m in self._platform_messages["DIALOGFLOW_MESSENGER"]:
-                # already has chips, need to add to same object
-                if m.get("type") == "chips":
-                    existing_chips = True
-                    break
-
-            if not existing_chips:
-                chip_resp = df_messenger._build_suggestions(*replies)
-                self._platform_messages["DIALOGFLOW_MESSENGER"].append(chip_resp)
-
-            else:
-                df_chips = []
-                for i in replies:
-                    chip = df_messenger._build_chip(i)
-                    df_chips.append(chip)
-
-                for m in self._platform_messages["DIALOGFLOW_MESSENGER"]:
-                    if m.get("type") == "chips":
-                        m["options"].append(df_chips)
-
+        self._elements.append(("chips", replies))
         return self
 
     def link_out(self, name, url):
         """Presents a chip similar to suggestion, but instead links to a url"""
-        self._messages.append(
-            {
-                "platform": "ACTIONS_ON_GOOGLE",
-                "linkOutSuggestion": {"destinationName": name, "uri": url},
-            }
-        )
-
-        if "DIALOGFLOW_MESSENGER" in self._integrations:
-            existing_chips = None
-            for m in self._platform_messages["DIALOGFLOW_MESSENGER"]:
-                # already has chips, need to add to same object
-                if m.get("type") == "chips":
-                    existing_chips = True
-                    break
-
-            link_chip = df_messenger._build_chip(name, url=url)
-
-            if not existing_chips:
-                chip_resp = {"type": "chips", "options": [link_chip]}
-                self._platform_messages["DIALOGFLOW_MESSENGER"].append(chip_resp)
-
-            else:
-                for m in self._platform_messages["DIALOGFLOW_MESSENGER"]:
-                    if m.get("type") == "chips":
-                        m["options"].append(link_chip)
-
+        self._elements.append(("link_out", name, url))
         return self
 
     def card(
@@ -245,43 +222,19 @@ class _Response(object):
 
 
         """
-        df_card = dialogflow.build_card(
-            text, title, img_url, img_alt, subtitle, link, link_title
-        )
-        self._messages.append(df_card)
-
-        # df_messengar car is a combo of description + button
-        if "DIALOGFLOW_MESSENGER" in self._integrations:
-
-            if img_url is not None:
-                description = df_messenger._build_info_response(
-                    text, title, img_url, img_alt
-                )
-
-            else:
-                description = df_messenger._build_description_response(text, title)
-
-            self._platform_messages["DIALOGFLOW_MESSENGER"].append(description)
-
-            if link:
-                btn = df_messenger._build_button(
-                    link, link_title, btn_icon, btn_icon_color
-                )
-                self._platform_messages["DIALOGFLOW_MESSENGER"].append(btn)
-
-        if "GOOGLE_HANGOUTS" in self._integrations:
-            hangouts_card = hangouts.build_card(
-                text, title, img_url, img_alt, subtitle, link, link_title
-            )
-            self._platform_messages["GOOGLE_HANGOUTS"].append(hangouts_card)
-
-        if "ACTIONS_ON_GOOGLE" in self._integrations:
-            actions_card = actions.build_card(
-                text, title, img_url, img_alt, subtitle, link, link_title, buttons
-            )
-
-            self._messages.append(actions_card)
-
+        card = {
+            "text": text,
+            "title": title,
+            "img_url": img_url,
+            "img_alt": img_alt,
+            "subtitle": subtitle,
+            "link": link,
+            "link_title": link_title,
+            "buttons": buttons,
+            "btn_icon": btn_icon,
+            "btn_icon_color": btn_icon_color,
+        }
+        self._elements.append(("card", card))
         return self
 
     def build_list(self, title=None, items=None):
@@ -359,12 +312,7 @@ class _Response(object):
             media_object["largeImage"]["imageUri"] = icon_url
             media_object["largeImage"]["accessibilityText"] = icon_alt or name
 
-        self._messages.append(
-            {
-                "platform": "ACTIONS_ON_GOOGLE",
-                "mediaContent": {"mediaObjects": [media_object], "mediaType": "AUDIO",},
-            }
-        )
+        self._elements.append(("media", media_object))
         return self
 
 
@@ -481,20 +429,7 @@ class _ListSelector(_CardWithItems):
         super(_ListSelector, self).__init__(speech, display_text, items)
 
     def _add_message(self):
-
-        self._messages.append(
-            {
-                "platform": "ACTIONS_ON_GOOGLE",
-                "listSelect": {"title": self._title, "items": self._items},
-            }
-        )
-        self._add_platform_msgs()
-
-    def _add_platform_msgs(self):
-
-        if "DIALOGFLOW_MESSENGER" in self._integrations:
-            list_resp = df_messenger._build_list(self._title, self._items)
-            self._platform_messages["DIALOGFLOW_MESSENGER"].extend(list_resp)
+        self._elements.append(("list", self._title, self._items))
 
 
 class _CarouselCard(_ListSelector):
@@ -504,9 +439,7 @@ class _CarouselCard(_ListSelector):
         super(_CarouselCard, self).__init__(speech, display_text, items=items)
 
     def _add_message(self):
-        self._messages.append(
-            {"platform": "ACTIONS_ON_GOOGLE", "carouselSelect": {"items": self._items}}
-        )
+        self._elements.append(("carousel", self._items))
 
 
 class tell(_Response):
@@ -562,7 +495,7 @@ class permission(_Response):
 
     def __init__(self, permissions, context=None, update_intent=None):
         super(permission, self).__init__(speech=None)
-        self._messages[:] = []
+        self._elements[:] = []
 
         if isinstance(permissions, str):
             permissions = [permissions]
@@ -596,7 +529,7 @@ class sign_in(_Response):
     def __init__(self, reason=None):
         super(sign_in, self).__init__(speech=None)
 
-        self._messages[:] = []
+        self._elements[:] = []
         self._response = {
             "payload": {
                 "google": {
@@ -1,3 +1,6 @@
+from flask_assistant.response.renderer import Renderer, register_renderer
+
+
 def _build_info_response(
     text, title, img_url=None, img_alt=None, subtitle=None, link=None, link_title=None,
 ):
@@ -72,3 +75,64 @@ def _build_suggestions(*replies):
         chips["options"].append(c)
 
     return chips
+
+
+@register_renderer
+class DFMessengerRenderer(Renderer):
+    """Renders responses for Dialogflow Messenger as a single rich content payload.
+
+    Chips and link outs share one chips element, kept as a slot when first added.
+    """
+
+    platform = "DIALOGFLOW_MESSENGER"
+    order = 20
+
+    def __init__(self, messages, integrated):
+        super(DFMessengerRenderer, self).__init__(messages, integrated)
+        self._content = []
+        self._chips = None
+
+    def _add_chips(self, options):
+        if self._chips is None:
+            self._chips = {"type": "chips", "options": options}
+            self._content.append(self._chips)
+        else:
+            self._chips["options"].extend(options)
+
+    def chips(self, replies):
+        if self.integrated:
+            self._add_chips([_build_chip(r) for r in replies])
+
+    def link_out(self, name, url):
+        if self.integrated:
+            self._add_chips([_build_chip(name, url=url)])
+
+    def card(self, card):
+        # a card is a combo of description + button
+        if not self.integrated:
+            return
+
+        if card["img_url"] is not None:
+            description = _build_info_response(
+                card["text"], card["title"], card["img_url"], card["img_alt"]
+            )
+        else:
+            description = _build_description_response(card["text"], card["title"])
+        self._content.append(description)
+
+        if card["link"]:
+            self._content.append(
+                _build_button(
+                    card["link"],
+                    card["link_title"],
+                    card["btn_icon"],
+                    card["btn_icon_color"],
+                )
+            )
+
+    def list(self, title, items):
+        if self.integrated:
+            self._content.extend(_build_list(title, items))
+
+    def finish(self, speech, display_text):
+        self.messages.append({"payload": {"richContent": [self._content]}})
@@ -1,17 +1,64 @@
-from google.cloud import dialogflow_v2 as df
-from google.protobuf.json_format import MessageToDict
+from flask_assistant.response.renderer import Renderer, register_renderer
 
 
-def build_card(
-    text, title, img_url=None, img_alt=None, subtitle=None, link=None, link_title=None,
-):
+def card_payload(title, subtitle, button_text=None, postback=None):
+    """Returns a Dialogflow Intent.Message.Card with a single button as a dict.
+
+    The dict is identical to the one built by the google-cloud-dialogflow
+    protobuf types, see :func:`proto_card_payload`, without importing them.
+    """
+    return {
+        "title": title or "",
+        "subtitle": subtitle or "",
+        "buttons": [{"text": button_text or "", "postback": postback or ""}],
+        "image_uri": "",
+    }
+
 
-    button = df.Intent.Message.Card.Button(
-        text=link_title, postback=link
-    )
-    card = df.Intent.Message.Card(title=title, subtitle=text)
+def proto_card_payload(title, subtitle, button_text=None, postback=None):
+    """Builds the card of :func:`card_payload` with the google-cloud-dialogflow protobuf types"""
+    from google.cloud import dialogflow_v2 as df
+
+    button = df.Intent.Message.Card.Button(text=button_text, postback=postback)
+    card = df.Intent.Message.Card(title=title, subtitle=subtitle)
     card.buttons.append(button)
-    payload = df.Intent.Message.Card.to_dict(card)
+    return df.Intent.Message.Card.to_dict(card)
+
+
+def build_card(
+    text,
+    title,
+    img_url=None,
+    img_alt=None,
+    subtitle=None,
+    link=None,
+    link_title=None,
+    use_protobuf=False,
+):
+    build_payload = proto_card_payload if use_protobuf else card_payload
+    payload = build_payload(title, text, link_title, link)
     return {"card": payload, "lang": "en"}
-    # card_payload = {"card": {"title": title, "subtitle": text, "formattedText": text}}
-    # return card_payload
+
+
+@register_renderer
+class DialogflowRenderer(Renderer):
+    """Renders the default messages, displayed on every platform"""
+
+    platform = None
+    order = 0
+
+    def speech(self, speech, display_text, is_ssml):
+        self.messages.append({"text": {"text": [speech]}})
+
+    def card(self, card):
+        self.messages.append(
+            build_card(
+                card["text"],
+                card["title"],
+                card["img_url"],
+                card["img_alt"],
+                card["subtitle"],
+                card["link"],
+                card["link_title"],
+            )
+        )
@@ -1,9 +1,18 @@
-from google.cloud import dialogflow_v2 as df
 import logging
 
+from flask_assistant.response.dialogflow import card_payload, proto_card_payload
+from flask_assistant.response.renderer import Renderer, register_renderer
+
 
 def build_card(
-    text, title, img_url=None, img_alt=None, subtitle=None, link=None, link_title=None,
+    text,
+    title,
+    img_url=None,
+    img_alt=None,
+    subtitle=None,
+    link=None,
+    link_title=None,
+    use_protobuf=False,
 ):
     if link is None:
         logging.warning(
@@ -14,11 +23,40 @@ def build_card(
     if link_title is None:
         link_title = "Learn More"
 
-    button = df.Intent.Message.Card.Button(
-        text=link_title, postback=link
-    )
-    card = df.Intent.Message.Card(title=title, subtitle=text)
-    card.buttons.append(button)
-
-    payload = df.Intent.Message.Card.to_dict(card)
+    build_payload = proto_card_payload if use_protobuf else card_payload
+    payload = build_payload(title, text, link_title, link)
     return {"card": payload, "platform": "GOOGLE_HANGOUTS", "lang": "en"}
+
+
+@register_renderer
+class HangoutsRenderer(Renderer):
+    """Renders responses for Google Hangouts Chat, as a text message followed by cards"""
+
+    platform = "GOOGLE_HANGOUTS"
+    order = 30
+
+    def __init__(self, messages, integrated):
+        super(HangoutsRenderer, self).__init__(messages, integrated)
+        self._cards = []
+
+    def card(self, card):
+        if self.integrated:
+            self._cards.append(
+                build_card(
+                    card["text"],
+                    card["title"],
+                    card["img_url"],
+                    card["img_alt"],
+                    card["subtitle"],
+                    card["link"],
+                    card["link_title"],
+                )
+            )
+
+    def finish(self, speech, display_text):
+        if display_text is None:
+            display_text = speech
+        self.messages.append(
+            {"platform": "GOOGLE_HANGOUTS", "text": {"text": [display_text]}}
+        )
+        self.messages.extend(self._cards)
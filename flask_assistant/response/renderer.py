@@ -0,0 +1,76 @@
+"""Renderers turning the elements of a response into platform messages.
+
+Each platform has a renderer class, registered with :func:`register_renderer`.
+When a response is rendered, a renderer is created for each platform the
+request can be displayed on, and every element recorded by the response
+(speech, chips, cards, lists...) is dispatched to the renderers in turn.
+"""
+
+
+class Renderer(object):
+    """Builds the messages of one platform for a response.
+
+    Subclasses implement the element methods of their platform, the others are
+    ignored. Messages are appended to the response's fulfillment messages as
+    elements are dispatched, or when rendering finishes.
+
+    Arguments:
+        messages {list} -- the fulfillment messages of the response
+        integrated {bool} -- True if the platform is enabled in INTEGRATIONS
+
+    Attributes:
+        platform {str} -- name of the platform in INTEGRATIONS, None for messages
+                          displayed on every platform
+        order {int} -- renderers are run in ascending order
+    """
+
+    platform = None
+    order = 0
+
+    def __init__(self, messages, integrated):
+        self.messages = messages
+        self.integrated = integrated
+
+    def speech(self, speech, display_text, is_ssml):
+        pass
+
+    def chips(self, replies):
+        pass
+
+    def link_out(self, name, url):
+        pass
+
+    def card(self, card):
+        pass
+
+    def media(self, media_object):
+        pass
+
+    def list(self, title, items):
+        pass
+
+    def carousel(self, items):
+        pass
+
+    def finish(self, speech, display_text):
+        """Called once every element was dispatched"""
+        pass
+
+
+_renderers = ()
+
+
+def register_renderer(cls):
+    """Class decorator registering a :class:`Renderer` subclass.
+
+    A renderer registered for a platform replaces the one registered before it.
+    """
+    global _renderers
+    others = [r for r in _renderers if r.platform != cls.platform]
+    _renderers = tuple(sorted(others + [cls], key=lambda r: r.order))
+    return cls
+
+
+def registered_renderers():
+    """Returns the registered renderer classes, in the order they are run"""
+    return _renderers
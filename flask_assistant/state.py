@@ -0,0 +1,48 @@
+"""Per-turn state of the webhook request being fulfilled.
+
+All of the values exposed by the ``flask_assistant`` context locals live on a
+single :class:`TurnState` built once per request. The state is held in a
+:class:`~contextvars.ContextVar`, so concurrent turns are isolated from each
+other whether they run in threads, greenlets or asyncio tasks.
+"""
+
+from contextvars import ContextVar
+
+
+class TurnState(object):
+    """Request-scoped values of a single webhook turn"""
+
+    __slots__ = (
+        "assist",
+        "request",
+        "intent",
+        "context_in",
+        "session_id",
+        "user",
+        "profile",
+        "profile_pending",
+        "storage_decoded",
+        "access_token",
+        "convert_errors",
+        "context_manager",
+        "log_turn",
+    )
+
+    def __init__(self, assist):
+        self.assist = assist
+        self.request = None
+        self.intent = None
+        self.context_in = []
+        self.session_id = None
+        self.user = {}
+        self.profile = None
+        # the ID token and userStorage are only decoded when first read
+        self.profile_pending = False
+        self.storage_decoded = True
+        self.access_token = None
+        self.convert_errors = None
+        self.context_manager = None
+        self.log_turn = True
+
+
+current_turn = ContextVar("flask_assistant_turn", default=None)
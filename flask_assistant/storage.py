@@ -0,0 +1,195 @@
+"""User storage persisted by Actions on Google across conversations.
+
+The platform keeps the existing userStorage when a response does not include
+it, so storage is only serialized and sent back when a handler changed it.
+
+Storage is encoded as JSON unless the Assistant is given another codec, such as
+:class:`ZlibStorageCodec` to fit more data in the 10k byte limit. Every codec
+reads both plain JSON and compressed storage, so codecs can be switched without
+losing the storage of existing users.
+"""
+
+import base64
+import json
+import zlib
+
+ZLIB_PREFIX = "z1:"
+
+
+def _loads(raw):
+    if raw.startswith(ZLIB_PREFIX):
+        raw = zlib.decompress(base64.b64decode(raw[len(ZLIB_PREFIX) :])).decode("utf-8")
+    return json.loads(raw)
+
+
+def _dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def _snapshot(obj):
+    """Returns the values of obj serialized independently of the order of their keys"""
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"))
+
+
+def _has_containers(obj):
+    return any(isinstance(v, (dict, list)) for v in obj.values())
+
+
+class JSONStorageCodec(object):
+    """Encodes userStorage as plain JSON"""
+
+    name = "json"
+
+    def loads(self, raw):
+        return _loads(raw)
+
+    def dumps(self, obj):
+        return json.dumps(obj)
+
+
+class ZlibStorageCodec(object):
+    """Encodes userStorage as zlib compressed, base64 encoded JSON.
+
+    Compressed storage is prefixed with its format version, ``z1:``. Storage
+    that would not be made smaller is sent as plain JSON.
+
+    Keyword Arguments:
+        level {int} -- zlib compression level, from 1 to 9 (default: {9})
+    """
+
+    name = "zlib"
+
+    def __init__(self, level=9):
+        self.level = level
+
+    def loads(self, raw):
+        return _loads(raw)
+
+    def dumps(self, obj):
+        plain = _dumps(obj)
+        compressed = zlib.compress(plain.encode("utf-8"), self.level)
+        encoded = ZLIB_PREFIX + base64.b64encode(compressed).decode("ascii")
+        if len(encoded) < len(plain.encode("utf-8")):
+            return encoded
+        return plain
+
+
+_storage_codecs = {"json": JSONStorageCodec, "zlib": ZlibStorageCodec}
+
+
+def get_storage_codec(codec=None):
+    """Returns a userStorage codec instance.
+
+    Keyword Arguments:
+        codec {str or object} -- "json", "zlib", or a codec object providing
+                                 loads and dumps of strings (default: {None}, "json")
+    """
+    if codec is None:
+        return JSONStorageCodec()
+
+    if isinstance(codec, str):
+        try:
+            return _storage_codecs[codec]()
+        except KeyError:
+            raise ValueError(
+                "Unknown storage codec {!r}, expected one of {}".format(
+                    codec, sorted(_storage_codecs)
+                )
+            )
+
+    if not (hasattr(codec, "loads") and hasattr(codec, "dumps")):
+        raise TypeError("A storage codec must provide loads and dumps methods")
+    return codec
+
+
+_default_codec = JSONStorageCodec()
+
+
+class UserStorage(dict):
+    """The ``storage`` context local, a dict that tracks whether it was changed.
+
+    Assigning, deleting or updating keys marks the storage as changed. Values
+    that are containers can be changed in place without the storage noticing,
+    so storage holding containers is compared to a snapshot of the data it was
+    decoded from, serialized once when it is received.
+
+    Arguments:
+        data {dict} -- the stored values
+
+    Keyword Arguments:
+        raw {str} -- the userStorage string the values were decoded from,
+                     None if they were not received from the platform (default: {None})
+        codec {object} -- codec the storage is encoded with (default: {JSONStorageCodec})
+    """
+
+    __slots__ = ("raw", "codec", "_changed", "_snapshot")
+
+    def __init__(self, data=(), raw=None, codec=None):
+        super(UserStorage, self).__init__(data)
+        self.raw = raw
+        self.codec = codec or _default_codec
+        self._changed = False
+        # containers added later are assigned, which marks the storage as changed
+        if raw is not None and _has_containers(self):
+            self._snapshot = _snapshot(self)
+        else:
+            self._snapshot = None
+
+    @classmethod
+    def decode(cls, raw, codec=None):
+        """Builds the storage received as a userStorage string"""
+        codec = codec or _default_codec
+        return cls(codec.loads(raw), raw=raw, codec=codec)
+
+    @property
+    def changed(self):
+        """True if the storage differs from what was received"""
+        if self._changed:
+            return True
+        if self._snapshot is None:
+            # storage that was not received is sent once it holds containers
+            return self.raw is None and _has_containers(self)
+        return _snapshot(self) != self._snapshot
+
+    def mark_changed(self):
+        """Marks the storage to be sent, as after changing one of its values in place"""
+        self._changed = True
+
+    def __setitem__(self, key, value):
+        self.mark_changed()
+        super(UserStorage, self).__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self.mark_changed()
+        super(UserStorage, self).__delitem__(key)
+
+    def clear(self):
+        self.mark_changed()
+        super(UserStorage, self).clear()
+
+    def pop(self, *args):
+        self.mark_changed()
+        return super(UserStorage, self).pop(*args)
+
+    def popitem(self):
+        self.mark_changed()
+        return super(UserStorage, self).popitem()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self.mark_changed()
+        return super(UserStorage, self).setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        self.mark_changed()
+        super(UserStorage, self).update(*args, **kwargs)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def encode(self):
+        """Returns the userStorage string to send, or None if it is unchanged"""
+        if not self.changed:
+            return None
+        return self.codec.dumps(self)
@@ -0,0 +1,93 @@
+"""Cache of Google ID tokens that have already been verified.
+
+Verifying an ID token's RSA signature is the most expensive step of decoding
+the user profile, and the same token is sent with every turn of a conversation.
+Verified tokens are remembered by the SHA-256 digest of the token, so repeat
+turns reuse the decoded profile until the token expires.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class VerifiedTokenCache(object):
+    """Bounded LRU mapping verified token digests to their decoded profiles.
+
+    Entries expire at the token's ``exp`` claim, or earlier when max_age is set.
+    The least recently used entry is evicted once maxsize entries are held.
+
+    Keyword Arguments:
+        maxsize {int} -- number of verified tokens kept, 0 disables the cache (default: {1024})
+        max_age {int} -- seconds an entry may be used, regardless of its exp claim (default: {None})
+        clock {callable} -- returns the current unix time in seconds (default: {time.time})
+    """
+
+    def __init__(self, maxsize=1024, max_age=None, clock=time.time):
+        if maxsize < 0:
+            raise ValueError("maxsize must not be negative")
+        self.maxsize = maxsize
+        self.max_age = max_age
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _key(token):
+        if isinstance(token, str):
+            token = token.encode("utf-8")
+        return hashlib.sha256(token).digest()
+
+    def get(self, token):
+        """Returns a copy of the profile decoded from token, or None if it must be verified"""
+        if not self.maxsize:
+            return None
+
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            profile, expires = entry
+            if self.clock() >= expires:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return dict(profile)
+
+    def put(self, token, profile, exp):
+        """Remembers the profile decoded from a verified token until exp
+
+        Arguments:
+            token {str} -- the verified ID token
+            profile {dict} -- the profile decoded from the token
+            exp {int} -- the token's exp claim, in unix time
+        """
+        if not self.maxsize:
+            return
+
+        expires = exp
+        if self.max_age is not None:
+            expires = min(expires, self.clock() + self.max_age)
+
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (dict(profile), expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,146 @@
+"""Logging of webhook turns without slowing down the response.
+
+Request and result summaries are only built for turns that are sampled and
+only serialized when a handler actually formats the record. Handlers can be
+moved behind a queue serviced by a background thread with
+:func:`start_log_listener`, so that log I/O never blocks a response.
+"""
+
+import atexit
+import itertools
+import json
+from logging.handlers import QueueHandler, QueueListener
+
+try:
+    from queue import SimpleQueue as _Queue
+except ImportError:  # python < 3.7
+    from queue import Queue as _Queue
+
+
+def _snapshot(obj):
+    """Copies the dicts and lists of a JSON-like object, sharing its immutable leaves"""
+    if isinstance(obj, dict):
+        return {k: _snapshot(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_snapshot(v) for v in obj]
+    return obj
+
+
+class LazyJSON(object):
+    """Log argument that is serialized to indented JSON only when the record is formatted"""
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __str__(self):
+        return json.dumps(self.obj, indent=2, sort_keys=True, default=str)
+
+    def snapshot(self):
+        """Returns a copy that later changes to the logged object do not affect"""
+        return LazyJSON(_snapshot(self.obj))
+
+
+class TurnLogger(object):
+    """Emits structured summaries of the turns selected by sampling.
+
+    Each summary is logged with a lazily serialized message and is also attached
+    to the record as its ``turn`` attribute for structured handlers.
+
+    Arguments:
+        logger {logging.Logger} -- logger the summaries are emitted to
+
+    Keyword Arguments:
+        sample_rate {int} -- log one in every sample_rate turns (default: {1})
+    """
+
+    def __init__(self, logger, sample_rate=1):
+        if sample_rate < 1:
+            raise ValueError("sample_rate must be a positive integer")
+        self.logger = logger
+        self.sample_rate = sample_rate
+        self._counter = itertools.count()
+
+    def sample(self):
+        """Returns True if the next turn should be logged"""
+        if self.sample_rate == 1:
+            return True
+        return next(self._counter) % self.sample_rate == 0
+
+    def enabled(self, level, sampled=True):
+        """Returns True if a summary at level would be emitted for a turn"""
+        return sampled and self.logger.isEnabledFor(level)
+
+    def log(self, level, label, summary):
+        self.logger.log(
+            level, "%s: %s", label, LazyJSON(summary), extra={"turn": summary}
+        )
+
+
+class _TurnQueueHandler(QueueHandler):
+    """Queues records without formatting them, leaving that to the listener thread.
+
+    Turn summaries and request dumps are copied when queued, as the request
+    thread keeps updating the objects they refer to. Only their serialization is
+    left to the listener.
+    """
+
+    def prepare(self, record):
+        if record.exc_info:
+            # tracebacks must be rendered while the exception is still alive
+            return super(_TurnQueueHandler, self).prepare(record)
+        if isinstance(record.args, tuple):
+            record.args = tuple(
+                arg.snapshot() if isinstance(arg, LazyJSON) else arg
+                for arg in record.args
+            )
+        if hasattr(record, "turn"):
+            record.turn = _snapshot(record.turn)
+        return record
+
+
+_listeners = {}
+
+
+def start_log_listener(logger):
+    """Moves the logger's handlers behind a queue serviced by a background thread.
+
+    Records are then formatted and written by the listener thread instead of the
+    thread handling the request. Calling this again for the same logger returns
+    the listener already started.
+
+    Arguments:
+        logger {logging.Logger} -- the logger whose handlers are moved
+
+    Returns:
+        logging.handlers.QueueListener -- the started listener
+    """
+    if logger.name in _listeners:
+        return _listeners[logger.name]
+
+    queue = _Queue()
+    handlers = list(logger.handlers)
+    for handler in handlers:
+        logger.removeHandler(handler)
+    logger.addHandler(_TurnQueueHandler(queue))
+
+    listener = QueueListener(queue, *handlers, respect_handler_level=True)
+    listener.start()
+    _listeners[logger.name] = listener
+    atexit.register(stop_log_listener, logger)
+    return listener
+
+
+def stop_log_listener(logger):
+    """Flushes queued records and restores the handlers moved by :func:`start_log_listener`"""
+    listener = _listeners.pop(logger.name, None)
+    if listener is None:
+        return
+
+    listener.stop()
+    for handler in list(logger.handlers):
+        if isinstance(handler, _TurnQueueHandler):
+            logger.removeHandler(handler)
+    for handler in listener.handlers:
+        logger.addHandler(handler)
@@ -2,13 +2,13 @@ from __future__ import absolute_import
 from typing import Dict, Any
 import os
 import sys
-import logging
+import threading
+import time
 from google.auth import jwt
 from flask_assistant.core import Assistant
 from . import logger
 import requests
 
-logger.setLevel(logging.INFO)
 
 def import_with_3(module_name, path):
     import importlib.util
@@ -41,32 +41,205 @@ def get_assistant(filename):
             return obj
 
 
-def decode_token(token, client_id):
-    r = requests.get('https://accounts.google.com/.well-known/openid-configuration')
-    if(r.status_code != 200):
-        print("status_code != 200; status_code =", r.status_code)
-        print(r)
+GOOGLE_DISCOVERY_URL = "https://accounts.google.com/.well-known/openid-configuration"
+
+
+class CertificateFetchError(Exception):
+    """Raised when the discovery document or signing certificates cannot be fetched"""
+
+    def __init__(self, message, status=None, output=None):
+        super(CertificateFetchError, self).__init__(message)
+        self.status = status
+        self.output = output
+
+
+class _CacheEntry(object):
+    __slots__ = ("value", "fresh_until", "stale_until")
+
+    def __init__(self, value, fresh_until, stale_until):
+        self.value = value
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+
+def _cache_lifetime(cache_control, default_max_age, default_stale):
+    """Returns the max-age and stale-while-revalidate seconds of a Cache-Control header"""
+    max_age, stale = default_max_age, default_stale
+    for directive in (cache_control or "").split(","):
+        name, _, value = directive.strip().partition("=")
+        name = name.lower()
+        if name in ("no-store", "no-cache"):
+            max_age = 0
+        elif name in ("max-age", "stale-while-revalidate"):
+            try:
+                seconds = max(int(value.strip('"')), 0)
+            except ValueError:
+                continue
+            if name == "max-age":
+                max_age = seconds
+            else:
+                stale = seconds
+    return max_age, stale
+
+
+class CertificateCache(object):
+    """Caches the OpenID discovery document and the certificates used to verify ID tokens.
+
+    Documents are kept for the max-age of their Cache-Control header. Once
+    expired, a document is still served for the stale-while-revalidate window
+    while a background thread fetches a fresh copy, so only the first turn and
+    turns after a long idle period wait on the network.
+
+    Keyword Arguments:
+        discovery_url {str} -- OpenID configuration document (default: {GOOGLE_DISCOVERY_URL})
+        session {requests.Session} -- session used for fetching, shared between fetches (default: {None})
+        default_max_age {int} -- seconds to cache documents sent without a max-age (default: {300})
+        stale_while_revalidate {int} -- seconds an expired document is served while refreshing,
+            unless the response specifies its own window (default: {3600})
+        timeout {float} -- timeout of each fetch in seconds (default: {5})
+        clock {callable} -- returns the current time in seconds (default: {time.monotonic})
+    """
+
+    def __init__(
+        self,
+        discovery_url=GOOGLE_DISCOVERY_URL,
+        session=None,
+        default_max_age=300,
+        stale_while_revalidate=3600,
+        timeout=5,
+        clock=time.monotonic,
+    ):
+        self.discovery_url = discovery_url
+        self.session = session or requests.Session()
+        self.default_max_age = default_max_age
+        self.stale_while_revalidate = stale_while_revalidate
+        self.timeout = timeout
+        self.clock = clock
+
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._refreshing = set()
+
+    @property
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+        }
+
+    def certs(self):
+        """Returns the signing certificates, keyed by key id"""
+        discovery = self.get(self.discovery_url)
+        if "jwks_uri" not in discovery:
+            raise CertificateFetchError(
+                "Missing jwks_uri in '{}'".format(self.discovery_url)
+            )
+        # the v1 endpoint serves PEM certificates instead of JWKs
+        return self.get(discovery["jwks_uri"].replace("/v3/", "/v1/"))
+
+    def get(self, url):
+        """Returns the JSON document at url, from the cache when possible"""
+        now = self.clock()
+        entry = self._entries.get(url)
+        if entry is not None:
+            if now < entry.fresh_until:
+                self.hits += 1
+                return entry.value
+            if now < entry.stale_until:
+                self.stale_hits += 1
+                self._refresh_in_background(url)
+                return entry.value
+
+        with self._lock:
+            # another thread may have fetched the document while we waited
+            entry = self._entries.get(url)
+            if entry is not None and self.clock() < entry.fresh_until:
+                self.hits += 1
+                return entry.value
+            self.misses += 1
+            return self._fetch(url)
+
+    def clear(self):
+        self._entries.clear()
+
+    def _fetch(self, url):
         try:
-            return {'status':'BAD','error':r.status_code, "output": r.text}
-        except requests.exceptions.RequestException as e:   
-            return {'status':'BAD','error':r.status_code}
-
-    if "jwks_uri" not in r.json():
-        error_message = "Missing jwks_uri in 'https://accounts.google.com/.well-known/openid-configuration'"
-        print(error_message)
-        return {'status':'BAD','error':error_message}
-
-    googleapis_certs = r.json()["jwks_uri"].replace("/v3/", "/v1/")
-    r = requests.get(googleapis_certs)
-    if(r.status_code != 200):
-        print("status_code != 200; status_code =", r.status_code)
-        print(r)
+            r = self.session.get(url, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            raise CertificateFetchError(str(e))
+        if r.status_code != 200:
+            raise CertificateFetchError(
+                "Fetching {} returned {}".format(url, r.status_code),
+                status=r.status_code,
+                output=r.text,
+            )
+
+        value = r.json()
+        max_age, stale = _cache_lifetime(
+            r.headers.get("Cache-Control"),
+            self.default_max_age,
+            self.stale_while_revalidate,
+        )
+        now = self.clock()
+        self._entries[url] = _CacheEntry(value, now + max_age, now + max_age + stale)
+        return value
+
+    def _refresh_in_background(self, url):
+        with self._lock:
+            if url in self._refreshing:
+                return
+            self._refreshing.add(url)
+
+        thread = threading.Thread(target=self._refresh, args=(url,))
+        thread.daemon = True
+        thread.start()
+
+    def _refresh(self, url):
         try:
-            return {'status':'BAD','error':r.status_code, "output": r.text}
-        except requests.exceptions.RequestException as e:   
-            return {'status':'BAD','error':r.status_code}
-    else:
-        public_keys = r.json()
-        decoded = jwt.decode(token, certs=public_keys, verify=True, audience=client_id)
-        return {'status':'OK','output': decoded}
-        
+            self._fetch(url)
+            self.refreshes += 1
+        except Exception:
+            self.refresh_errors += 1
+            logger.warning("Failed to refresh %s", url, exc_info=True)
+        finally:
+            with self._lock:
+                self._refreshing.discard(url)
+
+
+certificate_cache = CertificateCache()
+
+
+def decode_token(token, client_id, cache=None):
+    """Verifies a Google ID token and decodes its claims.
+
+    Arguments:
+        token {str} -- the ID token received with the request
+        client_id {str} -- the expected audience of the token
+
+    Keyword Arguments:
+        cache {CertificateCache} -- cache the signing certificates are read from
+            (default: {certificate_cache})
+
+    Returns:
+        dict -- {'status': 'OK', 'output': claims} or {'status': 'BAD', 'error': ...}
+    """
+    cache = cache or certificate_cache
+    try:
+        public_keys = cache.certs()
+    except CertificateFetchError as e:
+        logger.error("Could not fetch token certificates: %s", e)
+        if e.status is None:
+            return {"status": "BAD", "error": str(e)}
+        return {"status": "BAD", "error": e.status, "output": e.output}
+
+    decoded = jwt.decode(token, certs=public_keys, verify=True, audience=client_id)
+    return {"status": "OK", "output": decoded}
@@ -30,11 +30,16 @@ setup(
         "aniso8601",
         "google-auth",
         "google-cloud-dialogflow",
+        'contextvars; python_version < "3.7"',
     ],
     setup_requires=["pytest-runner"],
     tests_require=["pytest"],
     test_suite="tests",
-    extras_require={"HassRemote": ["homeassistant>=0.37.1"]},
+    extras_require={
+        "HassRemote": ["homeassistant>=0.37.1"],
+        "async": ["Flask[async]"],
+        "orjson": ["orjson"],
+    },
     entry_points={
         "console_scripts": [
             "schema=api_ai.cli:schema",
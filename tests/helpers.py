@@ -1,4 +1,8 @@
+import asyncio
 import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
 
 
 def build_payload(
@@ -68,3 +72,116 @@ def get_query_response(client, payload):
     resp = client.post("/", data=payload)
     assert resp.status_code == 200
     return json.loads(resp.data.decode("utf-8"))
+
+
+def run(coro):
+    """Runs a coroutine to completion, like asyncio.run on python >= 3.7"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+def asgi_post(app, payload, path="/"):
+    """Sends payload to an ASGI app, returns the response status and body"""
+    body = payload.encode("utf-8") if isinstance(payload, str) else payload
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode("latin-1"),
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json")],
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    run(app(scope, receive, send))
+    start, response_body = sent
+    assert start["type"] == "http.response.start"
+    return start["status"], response_body["body"]
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    # pooled clients keep connections open, so each one needs its own thread
+    daemon_threads = True
+
+
+class LocalServer(object):
+    """Stand-in HTTP server running in a background thread.
+
+    routes maps (method, path) to a callable taking the request body and
+    returning (status, headers, body). Body objects are sent as JSON. Every
+    received request is recorded as (method, path, body) in requests, and the
+    address of every client connection in clients.
+    """
+
+    def __init__(self, routes=None):
+        self.routes = routes if routes is not None else {}
+        self.requests = []
+        self.clients = set()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                path = self.path.split("?")[0]
+                server.requests.append((self.command, path, body))
+                server.clients.add(self.client_address)
+                route = server.routes.get((self.command, path))
+                if route is None:
+                    status, headers, payload = 404, {}, {"error": "not found"}
+                else:
+                    status, headers, payload = route(body)
+                if not isinstance(payload, (str, bytes)):
+                    payload = json.dumps(payload)
+                if isinstance(payload, str):
+                    payload = payload.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+        self._httpd = _ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, kwargs={"poll_interval": 0.05}
+        )
+        self._thread.daemon = True
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:{}".format(self._httpd.server_port)
+
+    def hits(self, path):
+        return sum(1 for _, p, _ in self.requests if p == path)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
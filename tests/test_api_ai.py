@@ -0,0 +1,176 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+import requests
+
+from api_ai.aio import AsyncApiAi
+from api_ai.api import ApiAi
+from tests.helpers import LocalServer, run
+
+
+@pytest.fixture
+def api_server(monkeypatch):
+    monkeypatch.undo()  # allow requests to reach the local server
+    with LocalServer() as server:
+        yield server
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Records the waits between retries instead of sleeping"""
+    waits = []
+    monkeypatch.setattr("urllib3.util.retry.time.sleep", waits.append)
+    return waits
+
+
+def make_api(server, **kwargs):
+    return ApiAi("dev", "client", base_url=server.url, **kwargs)
+
+
+def responses(*results):
+    """Route answering each request with the next of results"""
+    results = list(results)
+
+    def route(body):
+        return results.pop(0) if len(results) > 1 else results[0]
+
+    return route
+
+
+def test_uris(api_server):
+    api = make_api(api_server)
+    assert api.base_url == api_server.url + "/"
+    assert api._intent_uri() == api_server.url + "/intents?v=20150910"
+    assert api._entity_uri("abc") == api_server.url + "/entities/abc?v=20150910"
+    assert api._query_uri == api_server.url + "/query?v=20150910"
+    assert ApiAi().base_url == "https://dialogflow.googleapis.com/v2/"
+
+
+def test_connections_are_pooled(api_server):
+    api_server.routes[("GET", "/intents/1")] = responses((200, {}, {"id": "1"}))
+    api = make_api(api_server)
+    for _ in range(5):
+        assert api.get_intent("1") == {"id": "1"}
+
+    assert len(api_server.clients) == 1
+    assert api.stats["GET intents/{id}"]["calls"] == 5
+
+
+def test_retries_honor_retry_after(api_server, sleeps):
+    api_server.routes[("PUT", "/intents/1")] = responses(
+        (503, {"Retry-After": "7"}, {}),
+        (500, {}, {}),
+        (200, {}, {"status": {"code": 200}}),
+    )
+    api = make_api(api_server, backoff_factor=0.5)
+    assert api.put_intent("1", "{}") == {"status": {"code": 200}}
+    assert api_server.hits("/intents/1") == 3
+    assert sleeps == [7, 1.0]
+
+    stats = api.stats["PUT intents/{id}"]
+    assert (stats["calls"], stats["retries"], stats["errors"]) == (1, 2, 0)
+    assert stats["max"] >= stats["mean"] > 0
+
+
+def test_posts_retried_only_when_refused(api_server, sleeps):
+    api_server.routes[("POST", "/intents")] = responses(
+        (429, {"Retry-After": "1"}, {}), (200, {}, {"id": "new"})
+    )
+    api = make_api(api_server)
+    assert api.post_intent("{}") == {"id": "new"}
+    assert api_server.hits("/intents") == 2
+
+    api_server.routes[("POST", "/entities")] = responses((500, {}, {}))
+    with pytest.raises(requests.HTTPError):
+        api.post_entity("{}")
+    assert api_server.hits("/entities") == 1
+    assert api.stats["POST entities"]["errors"] == 1
+
+
+def test_errors_raised_once_retries_exhausted(api_server, sleeps):
+    api_server.routes[("GET", "/entities")] = responses((502, {}, {}))
+    api = make_api(api_server, retries=2)
+    with pytest.raises(requests.HTTPError) as exc_info:
+        api.agent_entities
+    assert exc_info.value.response.status_code == 502
+    assert api_server.hits("/entities") == 3
+    assert api.stats["GET entities"]["retries"] == 2
+
+
+def test_query_uses_client_token(api_server):
+    received = []
+
+    def query(body):
+        received.append(json.loads(body.decode("utf-8")))
+        return 200, {}, {"result": {}}
+
+    api_server.routes[("POST", "/query")] = query
+    resp = make_api(api_server).post_query("hello", sessionID="abc")
+    assert resp.json() == {"result": {}}
+    assert received[0]["query"] == "hello"
+    assert received[0]["sessionId"] == "abc"
+
+
+def test_async_client_bounds_concurrency(api_server):
+    lock = threading.Lock()
+    in_flight = [0, 0]  # current, max
+
+    def slow_put(body):
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+        time.sleep(0.05)
+        with lock:
+            in_flight[0] -= 1
+        return 200, {}, json.loads(body.decode("utf-8"))
+
+    ids = [str(i) for i in range(20)]
+    for i in ids:
+        api_server.routes[("PUT", "/intents/" + i)] = slow_put
+
+    async def put_all(api):
+        return await asyncio.gather(
+            *[api.put_intent(i, json.dumps({"id": i})) for i in ids]
+        )
+
+    api = AsyncApiAi(max_concurrency=5, dev_token="dev", base_url=api_server.url)
+    start = time.perf_counter()
+    results = run(put_all(api))
+    elapsed = time.perf_counter() - start
+    api.close()
+
+    assert [r["id"] for r in results] == ids
+    assert in_flight[1] == 5
+    assert elapsed < 20 * 0.05
+    assert len(api_server.clients) <= 5
+    assert api.stats["PUT intents/{id}"]["calls"] == 20
+
+
+def test_async_client_mirrors_api(api_server):
+    intents = [{"id": "1", "name": "greet"}, {"id": "2", "name": "order"}]
+    api_server.routes.update(
+        {
+            ("GET", "/intents"): responses((200, {}, intents)),
+            ("GET", "/entities"): responses((200, {}, [{"id": "3", "name": "size"}])),
+            ("POST", "/entities"): responses((200, {}, {"id": "4"})),
+            ("POST", "/query"): responses((200, {}, {"result": {}})),
+        }
+    )
+
+    async def use(api):
+        async with api:
+            intents = await api.agent_intents()
+            entities = await api.agent_entities()
+            created = await api.post_entity("{}")
+            query = await api.post_query("hi")
+        return intents, entities, created, query
+
+    api = AsyncApiAi(api=make_api(api_server))
+    intents, entities, created, query = run(use(api))
+    assert [i.name for i in intents] == ["greet", "order"]
+    assert [e.name for e in entities] == ["size"]
+    assert created == {"id": "4"}
+    assert query.json() == {"result": {}}
@@ -1,5 +1,26 @@
-from flask_assistant.manager import Context
-from tests.helpers import build_payload, get_query_response
+import asyncio
+import base64
+import decimal
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+
+import aniso8601
+import pytest
+from flask import Flask
+import flask_assistant
+from flask_assistant import Assistant, ask, context_manager, logger
+from flask_assistant.turnlog import (
+    TurnLogger,
+    _TurnQueueHandler,
+    start_log_listener,
+    stop_log_listener,
+)
+from flask_assistant.codec import StdlibCodec, get_codec
+from flask_assistant.manager import Context, ContextManager
+from tests.helpers import asgi_post, build_payload, get_query_response, run
 
 
 def test_intents_with_different_formatting(simple_client, intent_payload):
@@ -67,3 +88,466 @@ def test_docs_context(docs_assist):
         next_resp = get_query_response(client, next_payload)
         assert "farmers market" not in next_resp["fulfillmentText"]
         assert "BBQ" in next_resp["fulfillmentText"]
+
+
+def test_dispatch_compiled_lazily_and_invalidated(context_assist):
+    client = context_assist.app.test_client()
+    get_query_response(client, build_payload("ContextNotRequired"))
+    table = context_assist._dispatch
+    assert table is not None
+    assert get_query_response(client, build_payload("AddContext"))
+    assert context_assist._dispatch is table  # reused across requests
+
+    @context_assist.action("LateIntent")
+    def late_intent():
+        return ask("Registered after the first request")
+
+    assert context_assist._dispatch is None
+    resp = get_query_response(client, build_payload("LateIntent"))
+    assert "after the first request" in resp["fulfillmentText"]
+
+
+def test_compile_resolves_view_mappings():
+    app = Flask(__name__)
+    assist = Assistant(app, project_id="test-project-id")
+
+    mapping = {"city": "sys.geo-city"}
+    convert = {"day": "date"}
+
+    @assist.action("Book", mapping=mapping, convert=convert)
+    def book(city, day):
+        return ask("Booked {} on {}".format(city, day.isoformat()))
+
+    @assist.context("booking")
+    @assist.action("Book", mapping=mapping, convert=convert)
+    def book_in_context(city, day):
+        return ask("Rebooked")
+
+    @assist.prompt_for("day", intent_name="Book")
+    def prompt_day(city, day):
+        return ask("Which day?")
+
+    table = assist.compile()
+    dispatch = table["Book"]
+    view = dispatch.actions[0]
+    assert view.arg_names == ("city", "day")
+    assert view.param_names == ("geo-city", "day")
+    assert view.converters[0] is None
+    assert view.converters[1] is aniso8601.parse_date
+    assert view.required_contexts is None
+    assert dispatch.context_views == (dispatch.actions[1],)
+    assert dispatch.actions[1].required_contexts == frozenset(["booking"])
+    assert dispatch.prompts["day"].func is prompt_day
+
+    client = app.test_client()
+    payload = build_payload("Book", params={"geo-city": "Paris", "day": "2018-05-01"})
+    resp = get_query_response(client, payload)
+    assert resp["fulfillmentText"] == "Booked Paris on 2018-05-01"
+
+    payload = build_payload("Book", params={"geo-city": "Paris", "day": ""})
+    resp = get_query_response(client, payload)
+    assert resp["fulfillmentText"] == "Which day?"
+
+
+def test_context_view_requires_all_contexts():
+    app = Flask(__name__)
+    assist = Assistant(app, project_id="test-project-id")
+
+    @assist.action("Order")
+    def order():
+        return ask("No context")
+
+    @assist.context("pizza", "delivery")
+    @assist.action("Order")
+    def order_pizza_delivery():
+        return ask("Pizza delivery")
+
+    @assist.context("pizza")
+    @assist.action("Order")
+    def order_pizza():
+        return ask("Pizza")
+
+    def contexts(*names):
+        full = "projects/test-project-id/agent/sessions/1/contexts/{}"
+        return [{"name": full.format(n), "lifespanCount": 5} for n in names]
+
+    table = assist.compile()
+    views = table["Order"].context_views
+    assert views[0].context_mask == table.context_mask(["pizza", "delivery"])
+    assert views[1].context_mask == table.context_mask(["pizza"])
+    assert table.context_mask(["unknown"]) == 0
+
+    client = app.test_client()
+    for names, expected in [
+        ((), "No context"),
+        (("delivery",), "No context"),
+        (("pizza",), "Pizza"),
+        (("delivery", "pizza", "unknown"), "Pizza"),
+    ]:
+        payload = build_payload("Order", contexts=contexts(*names))
+        resp = get_query_response(client, payload)
+        assert resp["fulfillmentText"] == expected
+
+
+@pytest.fixture(scope="session")
+def async_assist():
+    app = Flask(__name__)
+    assist = Assistant(app, project_id="test-project-id")
+
+    @assist.action("SlowIntent")
+    async def slow_action(name):
+        await asyncio.sleep(0.1)
+        return ask("Hello {}".format(name))
+
+    @assist.action("SyncIntent")
+    def sync_action():
+        return ask("Synchronous")
+
+    return assist
+
+
+def test_async_action_with_flask_route(async_assist):
+    client = async_assist.app.test_client()
+    payload = build_payload("SlowIntent", params={"name": "Ada"})
+    resp = get_query_response(client, payload)
+    assert resp["fulfillmentText"] == "Hello Ada"
+
+    resp = get_query_response(client, build_payload("SyncIntent"))
+    assert resp["fulfillmentText"] == "Synchronous"
+
+
+def test_async_action_without_asgiref(async_assist, monkeypatch):
+    monkeypatch.setattr(flask_assistant.core, "_has_asgiref", False)
+    client = async_assist.app.test_client()
+    payload = build_payload("SlowIntent", params={"name": "Ada"})
+    resp = get_query_response(client, payload)
+    assert resp["fulfillmentText"] == "Hello Ada"
+
+
+def test_fulfill_async_actions_concurrently(async_assist):
+    names = ["user{}".format(i) for i in range(20)]
+
+    async def fulfill_all():
+        return await asyncio.gather(
+            *[
+                async_assist.fulfill(
+                    json.loads(build_payload("SlowIntent", params={"name": n}))
+                )
+                for n in names
+            ]
+        )
+
+    start = time.perf_counter()
+    results = run(fulfill_all())
+    elapsed = time.perf_counter() - start
+
+    # each turn sleeps for 0.1s, they must have been in flight together
+    assert elapsed < 1.0
+    assert [r["fulfillmentText"] for r in results] == [
+        "Hello {}".format(n) for n in names
+    ]
+
+
+def test_fulfill_sync_action_and_unmatched_intent(async_assist):
+    result = run(async_assist.fulfill(json.loads(build_payload("SyncIntent"))))
+    assert result["fulfillmentText"] == "Synchronous"
+
+    result = run(async_assist.fulfill(json.loads(build_payload("Unknown"))))
+    assert result is None
+
+
+def test_asgi_app_fulfills_webhook_requests(async_assist):
+    payload = build_payload("SlowIntent", params={"name": "Ada"})
+    status, body = asgi_post(async_assist.asgi_app, payload)
+    assert status == 200
+    assert json.loads(body)["fulfillmentText"] == "Hello Ada"
+
+    status, body = asgi_post(async_assist.asgi_app, build_payload("SyncIntent"))
+    assert status == 200
+    assert json.loads(body)["fulfillmentText"] == "Synchronous"
+
+
+def test_asgi_app_rejects_bad_requests(async_assist):
+    status, body = asgi_post(async_assist.asgi_app, "not json")
+    assert status == 400
+
+    status, body = asgi_post(async_assist.asgi_app, build_payload("Unknown"))
+    assert status == 400
+
+
+def test_lambda_handler_matches_flask_route(async_assist):
+    client = async_assist.app.test_client()
+    for payload in [
+        build_payload("SlowIntent", params={"name": "Ada"}),
+        build_payload("SyncIntent"),
+    ]:
+        resp = async_assist.lambda_handler({"body": payload})
+        assert resp["statusCode"] == 200
+        assert resp["headers"] == {"Content-Type": "application/json"}
+        assert isinstance(resp["body"], str)
+        assert json.loads(resp["body"]) == get_query_response(client, payload)
+        wsgi_resp = async_assist.run_aws_lambda({"body": payload})
+        assert json.loads(wsgi_resp["body"]) == json.loads(resp["body"])
+
+    payload = build_payload("SyncIntent").encode("utf-8")
+    event = {"body": base64.b64encode(payload).decode(), "isBase64Encoded": True}
+    resp = async_assist.lambda_handler(event, context=None)
+    assert json.loads(resp["body"])["fulfillmentText"] == "Synchronous"
+
+
+def test_lambda_handler_rejects_bad_requests(async_assist):
+    for event in [{"body": "not json"}, {}, {"body": build_payload("Unknown")}]:
+        resp = async_assist.lambda_handler(event)
+        assert resp["statusCode"] == 400
+        assert resp["body"] == ""
+
+
+def test_get_codec():
+    stdlib = get_codec("json")
+    assert isinstance(stdlib, StdlibCodec)
+    assert stdlib.dumps({"text": "café"}) == '{"text":"café"}'.encode("utf-8")
+    assert stdlib.loads(b'{"a": [1, 2]}') == {"a": [1, 2]}
+
+    with pytest.raises(ValueError):
+        get_codec("yaml")
+    with pytest.raises(TypeError):
+        get_codec(object())
+
+
+def test_assistant_uses_json_codec():
+    class RecordingCodec(StdlibCodec):
+        def __init__(self):
+            self.calls = []
+
+        def loads(self, data):
+            self.calls.append(("loads", type(data)))
+            return super(RecordingCodec, self).loads(data)
+
+        def dumps(self, obj):
+            self.calls.append(("dumps", type(obj)))
+            return super(RecordingCodec, self).dumps(obj)
+
+    codec = RecordingCodec()
+    app = Flask(__name__)
+    assist = Assistant(app, project_id="test-project-id", json_codec=codec)
+    assert assist.json_codec is codec
+
+    @assist.action("TestIntent")
+    def test_intent():
+        return ask("Message")
+
+    resp = get_query_response(app.test_client(), build_payload("TestIntent"))
+    assert resp["fulfillmentText"] == "Message"
+    assert codec.calls == [("loads", bytes), ("dumps", dict)]
+
+    status, body = asgi_post(assist.asgi_app, build_payload("TestIntent"))
+    assert status == 200
+    assert codec.calls[2:] == [("loads", bytes), ("dumps", dict)]
+
+
+@pytest.mark.parametrize("codec", ["json", "orjson"])
+def test_codecs_serialize_like_flask(codec):
+    if codec == "orjson":
+        pytest.importorskip("orjson")
+    app = Flask(__name__)
+    assist = Assistant(app, project_id="test-project-id", json_codec=codec)
+
+    @assist.action("Order", mapping={"day": "date"}, convert={"day": "date"})
+    def order(day):
+        context_manager.add(
+            "order",
+            parameters={
+                "day": day,
+                "price": decimal.Decimal("9.99"),
+                "sizes": {1: "small", 2: "large"},
+                "reference": 1180591620717411303424,  # wider than 64 bits
+            },
+        )
+        return ask("Ordered")
+
+    payload = build_payload("Order", params={"date": "2018-04-23"})
+    resp = get_query_response(app.test_client(), payload)
+    assert resp["outputContexts"][0]["parameters"] == {
+        "day": "Mon, 23 Apr 2018 00:00:00 GMT",
+        "price": "9.99",
+        "sizes": {"1": "small", "2": "large"},
+        "reference": 1180591620717411303424,  # wider than 64 bits
+    }
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super(RecordingHandler, self).__init__()
+        self.records = []
+        self.messages = []
+
+    def emit(self, record):
+        self.records.append(record)
+        self.messages.append(record.getMessage())
+
+
+@pytest.fixture
+def log_records():
+    level = logger.level
+    handler = RecordingHandler()
+    logger.addHandler(handler)
+    yield handler
+    logger.removeHandler(handler)
+    logger.setLevel(level)
+
+
+def test_disabled_turn_logging_does_no_serialization(
+    simple_client, log_records, monkeypatch
+):
+    def fail(*args, **kwargs):
+        raise AssertionError("log payload serialized while logging is disabled")
+
+    monkeypatch.setattr(flask_assistant.core, "LazyJSON", fail)
+    monkeypatch.setattr(flask_assistant.turnlog, "LazyJSON", fail)
+    monkeypatch.setattr(flask_assistant.response.base, "LazyJSON", fail)
+    logger.setLevel(logging.WARNING)
+
+    resp = get_query_response(simple_client, build_payload("test_intent_2"))
+    assert "Message" in resp["fulfillmentText"]
+    assert log_records.records == []
+
+
+def test_turn_logging_is_sampled_and_structured(log_records):
+    app = Flask(__name__)
+    assist = Assistant(app, project_id="test-project-id", log_sample_rate=2)
+
+    @assist.action("TestIntent")
+    def test_intent():
+        return ask("Message")
+
+    client = app.test_client()
+    logger.setLevel(logging.INFO)
+    for _ in range(4):
+        get_query_response(client, build_payload("TestIntent"))
+
+    turns = [r.turn for r in log_records.records if hasattr(r, "turn")]
+    assert len(turns) == 4  # request and result summaries of 2 turns
+    assert turns[0]["Intent"] == "TestIntent"
+    assert turns[1]["Matched Action"] == "test_intent"
+    assert '"Intent": "TestIntent"' in log_records.messages[0]
+
+
+def test_background_logging_moves_handlers_to_listener(log_records):
+    logger.setLevel(logging.INFO)
+    listener = start_log_listener(logger)
+    try:
+        assert log_records not in logger.handlers
+        assert start_log_listener(logger) is listener
+        logger.info("Logged from %s", "the request thread")
+    finally:
+        stop_log_listener(logger)
+
+    assert log_records in logger.handlers
+    assert log_records.messages == ["Logged from the request thread"]
+
+
+def test_queued_turn_logs_are_snapshots():
+    queue = Queue()
+    queue_logger = logging.getLogger("flask_assistant.tests.queued")
+    queue_logger.addHandler(_TurnQueueHandler(queue))
+    queue_logger.propagate = False
+
+    summary = {"parameters": {"size": "large"}}
+    TurnLogger(queue_logger).log(logging.WARNING, "Request", summary)
+    summary["parameters"]["size"] = "small"
+    summary["userStorage"] = {}
+
+    record = queue.get_nowait()
+    assert json.loads(record.getMessage()[len("Request: ") :]) == {
+        "parameters": {"size": "large"}
+    }
+    assert record.turn == {"parameters": {"size": "large"}}
+
+
+def test_turn_state_isolated_between_threads():
+    app = Flask(__name__)
+    assist = Assistant(app, project_id="test-project-id")
+
+    @assist.action("Echo")
+    def echo(word):
+        time.sleep(0.05)  # let the other turns begin meanwhile
+        return ask(
+            "{} {} {}".format(
+                word,
+                flask_assistant.request["queryResult"]["parameters"]["word"],
+                flask_assistant.intent,
+            )
+        )
+
+    def post(word):
+        payload = build_payload("Echo", params={"word": word})
+        return get_query_response(app.test_client(), payload)["fulfillmentText"]
+
+    words = ["word{}".format(i) for i in range(8)]
+    with ThreadPoolExecutor(max_workers=len(words)) as pool:
+        results = list(pool.map(post, words))
+
+    assert results == ["{0} {0} Echo".format(w) for w in words]
+
+
+def test_turn_state_does_not_outlive_request():
+    app = Flask(__name__)
+    assist = Assistant(app, project_id="test-project-id")
+
+    @assist.action("Greet")
+    def greet():
+        return ask("Hello")
+
+    @app.route("/other")
+    def other():
+        return "{} {}".format(flask_assistant.intent, flask_assistant.session_id)
+
+    client = app.test_client()
+    get_query_response(client, build_payload("Greet"))
+    assert client.get("/other").get_data(as_text=True) == "None None"
+    assert flask_assistant.core.current_turn.get() is None
+
+
+def test_context_locals_read_turn_state_directly(monkeypatch):
+    app = Flask(__name__)
+    assist = Assistant(app, project_id="test-project-id")
+
+    @assist.action("Greet")
+    def greet(name):
+        def fail():
+            raise AssertionError("find_assistant called during a turn")
+
+        monkeypatch.setattr(flask_assistant.core, "find_assistant", fail)
+        speech = "{} {} {}".format(
+            flask_assistant.intent,
+            flask_assistant.session_id,
+            flask_assistant.access_token,
+        )
+        flask_assistant.context_manager.add("greeted")
+        return ask(speech)
+
+    resp = get_query_response(
+        app.test_client(), build_payload("Greet", params={"name": "Ada"})
+    )
+    assert resp["fulfillmentText"] == (
+        "Greet 88d13aa8-2999-4f71-b233-39cbf3a824a0 None"
+    )
+    assert "greeted" in resp["outputContexts"][0]["name"]
+
+
+def test_one_context_manager_per_turn(context_assist, monkeypatch):
+    created = []
+    init = ContextManager.__init__
+
+    def counting_init(self, *args, **kwargs):
+        created.append(self)
+        init(self, *args, **kwargs)
+
+    monkeypatch.setattr(ContextManager, "__init__", counting_init)
+    logger.setLevel(logging.INFO)  # turn summaries read the manager too
+
+    with context_assist.app.test_client() as client:
+        get_query_response(client, build_payload("AddContext"))
+        assert len(created) == 1
+        assert context_assist.context_manager is created[0]
+        assert context_assist.context_manager is context_assist.context_manager
@@ -88,3 +88,47 @@ def test_add_contexts_and_clear_all(manager):
     assert len(manager._cache) == 4
     assert len(manager.active) == 0
     assert len(manager.expired) == 4
+
+
+def test_received_contexts_parsed_lazily(simple_assist):
+    prefix = "projects/test-project-id/agent/sessions/1/contexts/"
+    contexts_json = [
+        {"name": prefix + "first", "lifespanCount": 2, "parameters": {"p": 1}},
+        {"name": prefix + "second"},
+    ]
+    m = ContextManager(simple_assist, contexts_json)
+    assert m._contexts == {}
+
+    assert [c.name for c in m.active] == ["first"]
+    assert [c.name for c in m.expired] == ["second"]
+    assert m.get_param("first", "p") == 1
+
+
+def test_active_and_expired_follow_lifespan(manager):
+    c1 = manager.add("sample1", lifespan=2)
+    c2 = manager.add("sample2", lifespan=2)
+    active = manager.active
+    assert manager.active is active  # unchanged views are not rebuilt
+
+    c1.lifespan = 1
+    assert manager.active is active
+    c1.lifespan = 0
+    assert [c.name for c in manager.active] == ["sample2"]
+    assert [c.name for c in manager.expired] == ["sample1"]
+
+    replaced = manager.add("sample2", lifespan=0)
+    c2.lifespan = 3  # no longer tracked once replaced
+    assert manager.active == ()
+    assert [c.name for c in manager.expired] == ["sample1", "sample2"]
+    assert manager.get("sample2") is replaced
+
+
+def test_active_and_expired_are_read_only(manager):
+    manager.add("sample1", lifespan=2)
+    active = manager.active
+    assert isinstance(active, tuple)
+    with pytest.raises(AttributeError):
+        active.append(Context("sample2"))
+
+    assert manager.active is active
+    assert isinstance(manager.expired, tuple)
@@ -0,0 +1,86 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# milliseconds flask_assistant may take to import once flask is imported
+IMPORT_BUDGET_MS = float(os.environ.get("FLASK_ASSISTANT_IMPORT_BUDGET_MS", 150))
+
+LAZY_MODULES = [
+    "requests",
+    "google.auth",
+    "google.cloud.dialogflow_v2",
+    "api_ai",
+    "homeassistant",
+    "flask_assistant.utils",
+    "flask_assistant.hass",
+]
+
+
+def import_time_ms(code, module):
+    """Returns the cumulative import time of module when running code"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and line.endswith("| " + module):
+            return int(line.split("|")[1]) / 1000
+    raise AssertionError("{} was not imported".format(module))
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="requires -X importtime")
+def test_import_time_within_budget():
+    # flask is imported first so only flask_assistant's own imports are timed,
+    # and the fastest of a few runs is kept to tolerate a busy machine
+    code = "import flask; import flask_assistant"
+    elapsed = min(import_time_ms(code, "flask_assistant") for _ in range(3))
+    assert (
+        elapsed < IMPORT_BUDGET_MS
+    ), "importing flask_assistant took {:.1f}ms, over the {:.0f}ms budget".format(
+        elapsed, IMPORT_BUDGET_MS
+    )
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="requires PEP 562")
+def test_optional_subsystems_imported_lazily():
+    code = (
+        "import sys, flask_assistant;"
+        "print(','.join(m for m in {!r} if m in sys.modules))".format(LAZY_MODULES)
+    )
+    out = subprocess.check_output([sys.executable, "-c", code])
+    assert out.decode().strip() == ""
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="requires PEP 562")
+def test_lazy_attributes():
+    code = (
+        "import sys, flask_assistant;"
+        "assist = flask_assistant.Assistant(project_id='p');"
+        "assert 'api_ai' not in sys.modules;"
+        "from flask_assistant import ApiAi, decode_token, hangouts;"
+        "assert isinstance(assist.api, ApiAi);"
+        "assert flask_assistant.utils.decode_token is decode_token;"
+        "assert hangouts.HangoutsRenderer"
+    )
+    subprocess.check_call([sys.executable, "-c", code])
+
+    import flask_assistant
+
+    with pytest.raises(AttributeError):
+        flask_assistant.not_an_attribute
+
+
+def test_lazy_import_keeps_logger_level():
+    code = (
+        "import logging, sys, flask_assistant;"
+        "logging.getLogger('flask_assistant').setLevel(logging.WARNING);"
+        "flask_assistant.decode_token;"
+        "assert 'flask_assistant.utils' in sys.modules;"
+        "assert flask_assistant.logger.level == logging.WARNING"
+    )
+    subprocess.check_call([sys.executable, "-c", code])
@@ -0,0 +1,135 @@
+import json
+import subprocess
+import sys
+
+import pytest
+from flask import Flask
+
+from flask_assistant import Assistant, ask
+from flask_assistant.response import renderer
+from tests.helpers import build_payload, get_query_response
+
+ALL_INTEGRATIONS = ["ACTIONS_ON_GOOGLE", "DIALOGFLOW_MESSENGER", "GOOGLE_HANGOUTS"]
+
+
+@pytest.fixture(scope="module")
+def card_assist():
+    app = Flask(__name__)
+    app.config["INTEGRATIONS"] = ALL_INTEGRATIONS
+    assist = Assistant(app, project_id="test-project-id")
+
+    @assist.action("Card")
+    def card():
+        resp = ask("Here is a card").card(
+            "Card text", "Card title", link="https://example.com", link_title="Open"
+        )
+        return resp.suggest("Yes", "No")
+
+    return assist
+
+
+def message_platforms(assist, source):
+    payload = json.loads(build_payload("Card"))
+    payload["originalDetectIntentRequest"]["source"] = source
+    resp = get_query_response(assist.app.test_client(), json.dumps(payload))
+
+    platforms = []
+    for m in resp["fulfillmentMessages"]:
+        platform = m.get("platform", "DIALOGFLOW_MESSENGER" if "payload" in m else None)
+        if platform not in platforms:
+            platforms.append(platform)
+    return platforms
+
+
+def test_messages_built_for_request_source(card_assist):
+    assert message_platforms(card_assist, "google") == [None, "ACTIONS_ON_GOOGLE"]
+    assert message_platforms(card_assist, "hangouts") == [None, "GOOGLE_HANGOUTS"]
+
+
+def test_messages_built_for_every_platform_from_unknown_source(card_assist):
+    expected = [None, "ACTIONS_ON_GOOGLE", "DIALOGFLOW_MESSENGER", "GOOGLE_HANGOUTS"]
+    assert message_platforms(card_assist, None) == expected
+    assert message_platforms(card_assist, "telegram") == expected
+
+
+def render(integrations, build):
+    app = Flask(__name__)
+    app.config["INTEGRATIONS"] = integrations
+    Assistant(app, project_id="test-project-id")
+    with app.test_request_context():
+        return build()._render()
+
+
+def test_df_messenger_chips_share_one_element():
+    resp = render(
+        ["DIALOGFLOW_MESSENGER"],
+        lambda: ask("Hi").suggest("a", "b").link_out("Site", "https://x").suggest("c"),
+    )
+    (content,) = [
+        m["payload"]["richContent"][0]
+        for m in resp["fulfillmentMessages"]
+        if "payload" in m
+    ]
+    assert content == [
+        {
+            "type": "chips",
+            "options": [
+                {"text": "a"},
+                {"text": "b"},
+                {"text": "Site", "link": "https://x"},
+                {"text": "c"},
+            ],
+        }
+    ]
+
+
+def test_register_renderer(monkeypatch):
+    monkeypatch.setattr(renderer, "_renderers", renderer.registered_renderers())
+
+    @renderer.register_renderer
+    class EchoRenderer(renderer.Renderer):
+        platform = "ECHO"
+        order = 40
+
+        def speech(self, speech, display_text, is_ssml):
+            if self.integrated:
+                self.messages.append({"platform": "ECHO", "text": {"text": [speech]}})
+
+    assert renderer.registered_renderers()[-1] is EchoRenderer
+    resp = render(["ECHO"], lambda: ask("Hi").add_msg("Again"))
+    echoed = [m for m in resp["fulfillmentMessages"] if m.get("platform") == "ECHO"]
+    assert echoed == [
+        {"platform": "ECHO", "text": {"text": ["Hi"]}},
+        {"platform": "ECHO", "text": {"text": ["Again"]}},
+    ]
+
+    resp = render([], lambda: ask("Hi"))
+    assert not [m for m in resp["fulfillmentMessages"] if m.get("platform") == "ECHO"]
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ("Text", "Title"),
+        ("Text", "Title", None, None, None, "https://example.com", "Open"),
+        ("Text", "Title", "https://example.com/img.png", "Alt", "Sub", None, "Open"),
+        ("Text", None, None, None, None, "https://example.com", None),
+        ("", ""),
+    ],
+)
+def test_card_builders_match_protobuf(args):
+    pytest.importorskip("google.cloud.dialogflow_v2")
+    from flask_assistant.response import dialogflow, hangouts
+
+    for module in (dialogflow, hangouts):
+        expected = module.build_card(*args, use_protobuf=True)
+        assert module.build_card(*args) == expected
+
+
+def test_responses_do_not_import_protobuf():
+    code = (
+        "import sys, flask_assistant.response;"
+        "print('google.cloud.dialogflow_v2' in sys.modules)"
+    )
+    out = subprocess.check_output([sys.executable, "-c", code])
+    assert out.strip() == b"False"
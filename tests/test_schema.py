@@ -0,0 +1,359 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from api_ai.api import ApiAi
+from api_ai.models import PhraseAnnotator, UserDefinedExample
+from api_ai.push import RateLimiter
+from api_ai.schema_handlers import EntityGenerator, IntentGenerator
+from api_ai.store import SchemaStore
+from api_ai.templates import TemplateRepository
+from flask_assistant import Assistant, ask
+from tests.helpers import LocalServer
+
+USER_SAYS = """
+intent0:
+  UserSays:
+    - a large pizza please
+  Annotations:
+    - large: size
+  Events:
+    - welcome
+"""
+
+ENTITIES = """
+size:
+  - large: [big, huge]
+  - small: [tiny]
+color:
+  - red
+  - blue
+"""
+
+
+class ManagementAPI(LocalServer):
+    """Stand-in of the intents and entities endpoints of the management API"""
+
+    def __init__(self, registered=(), failing=(), delay=0.02):
+        super(ManagementAPI, self).__init__()
+        self.failing = set(failing)
+        self.delay = delay
+        self.objects = {"intents": {}, "entities": {}}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        for object_type in self.objects:
+            self.routes[("GET", "/" + object_type)] = self.lister(object_type)
+            self.routes[("POST", "/" + object_type)] = self.creator(object_type)
+        for name in registered:
+            self.add("intents", name)
+
+    def add(self, object_type, name):
+        object_id = "{}-id".format(name)
+        self.objects[object_type][name] = object_id
+        path = "/{}/{}".format(object_type, object_id)
+        self.routes[("PUT", path)] = lambda body: (200, {}, {"status": {"code": 200}})
+        self.routes[("DELETE", path)] = lambda body: self.remove(object_type, name)
+        return object_id
+
+    def remove(self, object_type, name):
+        del self.objects[object_type][name]
+        return 200, {}, ""
+
+    def lister(self, object_type):
+        def route(body):
+            objects = self.objects[object_type].items()
+            return 200, {}, [{"id": i, "name": n} for n, i in objects]
+
+        return route
+
+    def creator(self, object_type):
+        def route(body):
+            with self._lock:
+                self.in_flight += 1
+                self.max_in_flight = max(self.in_flight, self.max_in_flight)
+            time.sleep(self.delay)
+            with self._lock:
+                self.in_flight -= 1
+                name = json.loads(body.decode("utf-8"))["name"]
+                if name in self.failing:
+                    return 400, {}, {"status": {"code": 400}}
+                if name in self.objects[object_type]:
+                    return 409, {}, {"status": {"code": 409, "errorType": "conflict"}}
+                object_id = self.add(object_type, name)
+            return 200, {}, {"id": object_id, "status": {"code": 200}}
+
+        return route
+
+    def count(self, method, path):
+        return sum(1 for m, p, _ in self.requests if (m, p) == (method, path))
+
+
+INTENT_NAMES = ["intent{}".format(i) for i in range(30)]
+
+
+def build_schema_assist(root, server, names=INTENT_NAMES, user_says=USER_SAYS):
+    templates = root / "templates"
+    templates.mkdir(exist_ok=True)
+    (templates / "user_says.yaml").write_text(user_says)
+    (templates / "entities.yaml").write_text(ENTITIES)
+
+    app = Flask(__name__, root_path=str(root))
+    assist = Assistant(app, project_id="test-project-id")
+    assist.api = ApiAi("dev", base_url=server.url)
+
+    def greet():
+        return ask("Hello")
+
+    for name in names:
+        assist.action(name)(greet)
+    return assist
+
+
+@pytest.fixture
+def management_api(monkeypatch):
+    monkeypatch.undo()  # allow requests to reach the local server
+    with ManagementAPI(registered=["intent3", "intent7"], failing=["intent5"]) as api:
+        yield api
+
+
+def test_intents_pushed_concurrently(tmp_path, management_api):
+    assist = build_schema_assist(tmp_path, management_api)
+    generator = IntentGenerator(assist, workers=8, rate=None)
+
+    start = time.perf_counter()
+    summary = generator.generate().summary
+    elapsed = time.perf_counter() - start
+
+    # 30 posts of 0.02s each, 8 at a time
+    assert elapsed < 30 * 0.02
+    assert management_api.max_in_flight == 8
+
+    assert summary.pushed == 29
+    assert [name for name, _ in summary.failures] == ["intent5"]
+    assert "Pushed 29 intents" in str(summary)
+
+    # the agent's intents are listed once for both conflicts
+    assert management_api.count("GET", "/intents") == 1
+    assert management_api.count("PUT", "/intents/intent3-id") == 1
+    assert management_api.count("PUT", "/intents/intent7-id") == 1
+
+    with open(generator.json_file) as f:
+        schema = json.load(f)
+    assert [i["name"] for i in schema] == ["intent{}".format(i) for i in range(30)]
+    ids = {i["name"]: i["id"] for i in schema}
+    assert ids["intent0"] == "intent0-id"
+    assert ids["intent3"] == "intent3-id"
+    assert ids["intent5"] is None
+    assert schema[0]["events"] == [{"name": "welcome"}]
+    annotated = [d for d in schema[0]["userSays"][0]["data"] if "meta" in d]
+    assert annotated == [
+        {"text": "large", "meta": "@size", "alias": "size", "userDefined": True}
+    ]
+
+
+def test_entities_pushed_with_rate_limit(tmp_path, management_api):
+    assist = build_schema_assist(tmp_path, management_api)
+    generator = EntityGenerator(assist, workers=4, rate=1000)
+    summary = generator.generate().summary
+
+    assert summary.pushed == 2
+    assert summary.failures == []
+    assert set(management_api.objects["entities"]) == {"size", "color"}
+
+
+def test_push_summary_counts_retries(tmp_path, management_api):
+    refusals = []
+    create = management_api.routes[("POST", "/intents")]
+
+    def refuse_first(body):
+        if not refusals:
+            refusals.append(body)
+            return 429, {"Retry-After": "0"}, {}
+        return create(body)
+
+    management_api.routes[("POST", "/intents")] = refuse_first
+    assist = build_schema_assist(tmp_path, management_api, names=INTENT_NAMES[:3])
+    summary = IntentGenerator(assist, rate=None).generate().summary
+    assert summary.pushed == 3
+    assert summary.retries == 1
+
+
+def sync(root, server, names=INTENT_NAMES, user_says=USER_SAYS, dry_run=False):
+    assist = build_schema_assist(root, server, names, user_says)
+    return IntentGenerator(assist, rate=None).generate(dry_run=dry_run)
+
+
+def test_sync_sends_only_changes(tmp_path, management_api):
+    diff = sync(tmp_path, management_api)
+    assert len(diff.added) == 30
+    assert management_api.count("POST", "/intents") == 30
+
+    # only the intent that failed to be created is sent again
+    management_api.requests[:] = []
+    diff = sync(tmp_path, management_api)
+    assert (diff.added, diff.changed, diff.deleted) == (["intent5"], [], [])
+    assert len(diff.unchanged) == 29
+    assert [m for m, _, _ in management_api.requests] == ["POST"]
+
+    management_api.failing.clear()
+    management_api.requests[:] = []
+    names = INTENT_NAMES[:1] + INTENT_NAMES[2:] + ["intent30"]
+    diff = sync(tmp_path, management_api, names, USER_SAYS.replace("large", "big"))
+    assert diff.added == ["intent5", "intent30"]
+    assert diff.changed == ["intent0"]
+    assert diff.deleted == ["intent1"]
+    assert diff.summary.failures == []
+    assert sorted((m, p) for m, p, _ in management_api.requests) == [
+        ("DELETE", "/intents/intent1-id"),
+        ("POST", "/intents"),
+        ("POST", "/intents"),
+        ("PUT", "/intents/intent0-id"),
+    ]
+    assert "intent1" not in management_api.objects["intents"]
+
+    management_api.requests[:] = []
+    diff = sync(tmp_path, management_api, names, USER_SAYS.replace("large", "big"))
+    assert len(diff.unchanged) == 30
+    assert management_api.requests == []
+
+
+def test_sync_dry_run(tmp_path, management_api, capsys):
+    sync(tmp_path, management_api, INTENT_NAMES[:3])
+    json_file = tmp_path / "schema" / "intents.json"
+    saved = json_file.read_text()
+    management_api.requests[:] = []
+
+    diff = sync(tmp_path, management_api, ["intent1", "intent2", "new"], dry_run=True)
+    assert (diff.added, diff.deleted) == (["new"], ["intent0"])
+    assert diff.summary is None
+    assert management_api.requests == []
+    assert json_file.read_text() == saved
+
+    out = capsys.readouterr().out
+    assert "Intents: 1 added, 0 changed, 1 deleted, 2 unchanged" in out
+    assert "  + new\n  - intent0" in out
+
+
+def test_rate_limiter():
+    now = [0.0]
+    waits = []
+
+    def sleep(seconds):
+        waits.append(seconds)
+        now[0] += seconds
+
+    limiter = RateLimiter(2, clock=lambda: now[0], sleep=sleep)
+    for _ in range(4):
+        limiter.acquire()
+    assert waits == [0.5, 0.5]
+
+    now[0] += 10
+    for _ in range(2):
+        limiter.acquire()
+    assert waits == [0.5, 0.5]
+    assert limiter.waited == 1.0
+
+
+def test_schema_store_read_once_and_saved_atomically(
+    tmp_path, management_api, monkeypatch
+):
+    sync(tmp_path, management_api)
+    json_file = tmp_path / "schema" / "intents.json"
+    saved = json_file.read_text()
+
+    loads = []
+    load = SchemaStore._load
+    monkeypatch.setattr(
+        SchemaStore, "_load", lambda self: loads.append(1) or load(self)
+    )
+
+    def interrupted_dump(obj, f, **kwargs):
+        f.write("[{")
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr("api_ai.store.json.dump", interrupted_dump)
+    with pytest.raises(KeyboardInterrupt):
+        sync(tmp_path, management_api, INTENT_NAMES[:10])
+
+    assert loads == [1]
+    assert json_file.read_text() == saved
+    assert os.listdir(str(tmp_path / "schema")) == ["intents.json"]
+
+    store = SchemaStore(str(json_file))
+    assert store.id("intent3") == "intent3-id"
+    assert store.id("intent5") is None
+    assert len(store.registered) == 29
+
+
+def test_templates_parsed_once_until_changed(tmp_path, management_api):
+    assist = build_schema_assist(tmp_path, management_api)
+    generator = IntentGenerator(assist, rate=None)
+    generator.templates = repository = TemplateRepository()
+
+    intents = generator.app_intents
+    assert repository.parses == 2  # user_says.yaml and entities.yaml
+    assert intents[0].userSays[0]["data"][1]["text"] == "large"
+
+    entities = generator.entity_template
+    assert repository.synonyms(entities, "size") == {
+        "large": ["big", "huge"],
+        "small": ["tiny"],
+    }
+    assert repository.synonyms(entities, "color") == {}
+    assert list(generator.get_synonyms("large", "size")) == ["big", "huge"]
+
+    user_says = generator.user_says_template
+    stat = os.stat(user_says)
+    with open(user_says, "w") as f:
+        f.write(USER_SAYS.replace("large", "small"))
+    os.utime(user_says, (stat.st_atime, stat.st_mtime + 1))
+
+    intents = generator.app_intents
+    assert repository.parses == 3
+    assert intents[0].userSays[0]["data"][1]["text"] == "small"
+    assert repository.intents(user_says)["intent0"]["Events"] == ["welcome"]
+
+
+def test_phrases_annotated_in_one_pass():
+    entity_map = {
+        "new": "sys.geo-city",
+        "new york": "sys.geo-city",
+        "red": "color",
+        "$5": "amount",
+        "c.o.d": "payment",
+    }
+    annotator = PhraseAnnotator(entity_map)
+
+    example = UserDefinedExample(
+        "tired of new york, pay $5 c.o.d for red new shoes", entity_map, annotator
+    )
+    assert example.data == [
+        {"text": "tired of "},
+        {
+            "text": "new york",
+            "meta": "@sys.geo-city",
+            "alias": "geo-city",
+            "userDefined": True,
+        },
+        {"text": ", pay "},
+        {"text": "$5", "meta": "@amount", "alias": "amount", "userDefined": True},
+        {"text": " "},
+        {"text": "c.o.d", "meta": "@payment", "alias": "payment", "userDefined": True},
+        {"text": " for "},
+        {"text": "red", "meta": "@color", "alias": "color", "userDefined": True},
+        {"text": " "},
+        {
+            "text": "new",
+            "meta": "@sys.geo-city",
+            "alias": "geo-city",
+            "userDefined": True,
+        },
+        {"text": " shoes"},
+    ]
+    assert list(annotator.split("renew cod credit")) == [("renew cod credit", False)]
+    assert list(PhraseAnnotator({}).split("red")) == [("red", False)]
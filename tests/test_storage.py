@@ -0,0 +1,175 @@
+import json
+
+import pytest
+from flask import Flask
+
+from flask_assistant import Assistant, ask, storage, user
+from flask_assistant.storage import (
+    UserStorage,
+    ZlibStorageCodec,
+    get_storage_codec,
+)
+from tests.helpers import build_payload, get_query_response
+
+
+def build_storage_payload(intent, user_storage):
+    payload = json.loads(build_payload(intent))
+    payload["originalDetectIntentRequest"]["payload"] = {
+        "user": {"userStorage": user_storage, "idToken": "not-a-token"}
+    }
+    return json.dumps(payload)
+
+
+def build_storage_assist(storage_codec=None):
+    app = Flask(__name__)
+    app.config["INTEGRATIONS"] = ["ACTIONS_ON_GOOGLE"]
+    assist = Assistant(
+        app,
+        project_id="test-project-id",
+        client_id="client-id",
+        storage_codec=storage_codec,
+    )
+
+    @assist.action("Ignore")
+    def ignore():
+        return ask("Not reading storage")
+
+    @assist.action("Count")
+    def count():
+        storage["count"] = storage.get("count", 0) + 1
+        return ask("Count is {}".format(storage["count"]))
+
+    @assist.action("AddItem")
+    def add_item(item):
+        storage.setdefault("items", []).append(item)
+        return ask("Added {}".format(item))
+
+    @assist.action("ReadUser")
+    def read_user():
+        return ask(str(user["userStorage"]["count"]))
+
+    return assist
+
+
+@pytest.fixture
+def storage_assist():
+    return build_storage_assist()
+
+
+def test_storage_and_profile_decoded_lazily(storage_assist, monkeypatch):
+    decoded = []
+    decode = UserStorage.decode
+
+    def counting_decode(raw, codec=None):
+        decoded.append(raw)
+        return decode(raw, codec)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("ID token verified without reading the profile")
+
+    monkeypatch.setattr(UserStorage, "decode", counting_decode)
+    monkeypatch.setattr(storage_assist, "_set_user_profile", fail)
+
+    client = storage_assist.app.test_client()
+    payload = build_storage_payload("Ignore", '{"count": 1}')
+    resp = get_query_response(client, payload)
+    assert resp["fulfillmentText"] == "Not reading storage"
+    assert decoded == []
+
+    payload = build_storage_payload("Count", '{"count": 1}')
+    resp = get_query_response(client, payload)
+    assert resp["fulfillmentText"] == "Count is 2"
+    assert decoded == ['{"count": 1}']
+
+    payload = build_storage_payload("ReadUser", '{"count": 5}')
+    assert get_query_response(client, payload)["fulfillmentText"] == "5"
+
+
+def sent_storage(client, intent, user_storage, **params):
+    payload = json.loads(build_storage_payload(intent, user_storage))
+    payload["queryResult"]["parameters"] = params
+    resp = get_query_response(client, json.dumps(payload))
+    return resp["payload"]["google"].get("userStorage")
+
+
+def test_unchanged_storage_is_not_sent(storage_assist):
+    client = storage_assist.app.test_client()
+    assert sent_storage(client, "Ignore", '{"count": 1}') is None
+    assert sent_storage(client, "ReadUser", '{"count": 1}') is None
+    assert json.loads(sent_storage(client, "Count", '{"count": 1}')) == {"count": 2}
+
+
+def test_storage_changed_in_place_is_sent(storage_assist):
+    client = storage_assist.app.test_client()
+    stored = sent_storage(client, "AddItem", '{"items": ["a"]}', item="b")
+    assert json.loads(stored) == {"items": ["a", "b"]}
+    stored = sent_storage(client, "AddItem", "{}", item="a")
+    assert json.loads(stored) == {"items": ["a"]}
+
+
+def test_user_storage_tracks_changes():
+    data = UserStorage.decode('{"a": 1, "nested": {"b": 2}}')
+    assert data == {"a": 1, "nested": {"b": 2}}
+    assert not data.changed
+    assert data.encode() is None
+
+    data.setdefault("a", 5)
+    assert not data.changed
+    data["nested"]["b"] = 3
+    assert data.changed
+
+    for change in [
+        lambda d: d.__setitem__("a", 2),
+        lambda d: d.__delitem__("a"),
+        lambda d: d.pop("a"),
+        lambda d: d.update(c=3),
+        lambda d: d.clear(),
+    ]:
+        data = UserStorage.decode('{"a": 1}')
+        change(data)
+        assert data.changed
+        assert json.loads(data.encode()) == dict(data)
+
+
+def test_compressed_storage_codec():
+    assist = build_storage_assist(storage_codec="zlib")
+    client = assist.app.test_client()
+    items = ["item number {}".format(i) for i in range(500)]
+
+    # plain JSON storage is still read, and sent back compressed
+    stored = sent_storage(client, "AddItem", json.dumps({"items": items}), item="x")
+    assert stored.startswith("z1:")
+    assert len(stored) < len(json.dumps({"items": items})) // 4
+
+    stored = sent_storage(client, "AddItem", stored, item="y")
+    assert get_storage_codec("json").loads(stored) == {"items": items + ["x", "y"]}
+
+    # storage too small to benefit is sent as plain JSON
+    assert sent_storage(client, "Count", "{}") == '{"count":1}'
+
+
+def test_get_storage_codec():
+    assert get_storage_codec().name == "json"
+    codec = ZlibStorageCodec(level=1)
+    assert get_storage_codec(codec) is codec
+    with pytest.raises(ValueError):
+        get_storage_codec("gzip")
+    with pytest.raises(TypeError):
+        get_storage_codec(object())
+
+
+def test_user_storage_change_check_does_not_decode(monkeypatch):
+    codec = ZlibStorageCodec()
+    raw = codec.dumps({"items": ["item {}".format(i) for i in range(100)]})
+    assert raw.startswith("z1:")
+    data = UserStorage.decode(raw, codec)
+
+    def fail(raw):
+        raise AssertionError("storage decoded again")
+
+    monkeypatch.setattr(codec, "loads", fail)
+    assert not data.changed
+    data["items"].append("item 100")
+    assert data.changed
+    assert not UserStorage({"items": []}, raw='{"items":[]}').changed
+    assert UserStorage({"items": []}).changed
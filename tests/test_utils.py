@@ -0,0 +1,262 @@
+import datetime
+import json
+import time
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from flask import Flask
+from google.auth import crypt, jwt
+
+from flask_assistant import Assistant, tell, profile
+from flask_assistant import utils
+from flask_assistant.tokens import VerifiedTokenCache
+from flask_assistant.utils import CertificateCache, decode_token, _cache_lifetime
+from tests.helpers import LocalServer, build_payload, get_query_response
+
+CLIENT_ID = "test-client-id.apps.googleusercontent.com"
+KEY_ID = "test-key"
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_signing_key():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "flask-assistant-test")])
+    now = datetime.datetime.utcnow()
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    cert_pem = cert.public_bytes(serialization.Encoding.PEM).decode("ascii")
+    return crypt.RSASigner.from_string(private_pem, key_id=KEY_ID), cert_pem
+
+
+@pytest.fixture(scope="module")
+def signing_key():
+    return make_signing_key()
+
+
+def make_token(signer, **claims):
+    now = int(time.time())
+    payload = {
+        "iss": "https://accounts.google.com",
+        "aud": CLIENT_ID,
+        "sub": "1234",
+        "iat": now,
+        "exp": now + 3600,
+        "name": "Test User",
+        "email": "test@example.com",
+    }
+    payload.update(claims)
+    return jwt.encode(signer, payload, key_id=KEY_ID).decode("ascii")
+
+
+@pytest.fixture
+def openid_server(monkeypatch, signing_key):
+    monkeypatch.undo()  # allow requests to reach the local server
+    _, cert_pem = signing_key
+    server = LocalServer()
+    server.cache_control = "public, max-age=60"
+
+    def discovery(body):
+        headers = {"Cache-Control": "public, max-age=600"}
+        return 200, headers, {"jwks_uri": server.url + "/oauth2/v3/certs"}
+
+    def certs(body):
+        return 200, {"Cache-Control": server.cache_control}, {KEY_ID: cert_pem}
+
+    server.routes[("GET", "/.well-known/openid-configuration")] = discovery
+    server.routes[("GET", "/oauth2/v1/certs")] = certs
+    with server:
+        yield server
+
+
+def make_cache(server, **kwargs):
+    return CertificateCache(
+        discovery_url=server.url + "/.well-known/openid-configuration", **kwargs
+    )
+
+
+def test_decode_token_caches_documents(openid_server, signing_key):
+    signer, _ = signing_key
+    cache = make_cache(openid_server)
+
+    for _ in range(3):
+        resp = decode_token(make_token(signer), CLIENT_ID, cache=cache)
+        assert resp["status"] == "OK"
+        assert resp["output"]["email"] == "test@example.com"
+
+    assert openid_server.hits("/.well-known/openid-configuration") == 1
+    assert openid_server.hits("/oauth2/v1/certs") == 1
+    assert cache.misses == 2
+    assert cache.hits == 4
+
+
+def test_stale_certs_are_served_while_refreshing(openid_server):
+    clock = FakeClock()
+    cache = make_cache(openid_server, stale_while_revalidate=300, clock=clock)
+    certs = cache.certs()
+
+    clock.now += 61  # certs expired, discovery document still fresh
+    assert cache.certs() == certs
+    assert cache.stale_hits == 1
+
+    deadline = time.time() + 5
+    while cache.refreshes < 1 and time.time() < deadline:
+        time.sleep(0.01)
+    assert cache.refreshes == 1
+    assert openid_server.hits("/oauth2/v1/certs") == 2
+
+    cache.certs()
+    assert cache.stale_hits == 1
+    assert openid_server.hits("/oauth2/v1/certs") == 2
+
+
+def test_expired_certs_are_fetched_after_stale_window(openid_server):
+    clock = FakeClock()
+    cache = make_cache(openid_server, stale_while_revalidate=300, clock=clock)
+    cache.certs()
+
+    clock.now += 61 + 300
+    cache.certs()
+    assert cache.stale_hits == 0
+    assert cache.misses == 3
+    assert openid_server.hits("/oauth2/v1/certs") == 2
+
+
+def test_no_cache_is_refetched(openid_server):
+    openid_server.cache_control = "no-cache"
+    cache = make_cache(openid_server, stale_while_revalidate=0)
+    cache.certs()
+    cache.certs()
+    assert openid_server.hits("/oauth2/v1/certs") == 2
+
+
+def test_fetch_error_is_bad_status(openid_server, signing_key):
+    signer, _ = signing_key
+    openid_server.routes[("GET", "/oauth2/v1/certs")] = lambda body: (
+        503,
+        {},
+        "unavailable",
+    )
+    cache = make_cache(openid_server)
+
+    resp = decode_token(make_token(signer), CLIENT_ID, cache=cache)
+    assert resp == {"status": "BAD", "error": 503, "output": "unavailable"}
+
+
+def test_cache_control_parsing():
+    assert _cache_lifetime("public, max-age=3600", 300, 60) == (3600, 60)
+    assert _cache_lifetime("max-age=100, stale-while-revalidate=30", 300, 60) == (
+        100,
+        30,
+    )
+    assert _cache_lifetime("no-store", 300, 60) == (0, 60)
+    assert _cache_lifetime(None, 300, 60) == (300, 60)
+    assert _cache_lifetime("max-age=soon", 300, 60) == (300, 60)
+
+
+def test_profile_from_id_token(openid_server, signing_key, monkeypatch):
+    signer, _ = signing_key
+    monkeypatch.setattr(utils, "certificate_cache", make_cache(openid_server))
+
+    app = Flask(__name__)
+    assist = Assistant(app, project_id="test-project-id", client_id=CLIENT_ID)
+
+    @assist.action("greeting")
+    def greeting():
+        return tell("Hello {}".format(profile["name"]))
+
+    payload = json.loads(build_payload("greeting"))
+    payload["originalDetectIntentRequest"]["payload"] = {
+        "user": {"idToken": make_token(signer)}
+    }
+
+    client = app.test_client()
+    for _ in range(2):
+        resp = client.post("/", data=json.dumps(payload))
+        assert "Hello Test User" in resp.get_data(as_text=True)
+
+    assert openid_server.hits("/oauth2/v1/certs") == 1
+
+
+def test_verified_tokens_skip_verification(openid_server, signing_key, monkeypatch):
+    signer, _ = signing_key
+    monkeypatch.setattr(utils, "certificate_cache", make_cache(openid_server))
+    verified = []
+    decode = utils.jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        verified.append(1)
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(utils.jwt, "decode", counting_decode)
+
+    app = Flask(__name__)
+    assist = Assistant(app, project_id="test-project-id", client_id=CLIENT_ID)
+
+    @assist.action("greeting")
+    def greeting():
+        return tell("{} {}".format(profile["name"], sorted(profile)))
+
+    payload = json.loads(build_payload("greeting"))
+    payload["originalDetectIntentRequest"]["payload"] = {
+        "user": {"idToken": make_token(signer)}
+    }
+
+    client = app.test_client()
+    texts = [
+        get_query_response(client, json.dumps(payload))["fulfillmentText"]
+        for _ in range(3)
+    ]
+    assert texts == ["Test User ['email', 'name']"] * 3
+    assert len(verified) == 1
+    assert assist.token_cache.hits == 2
+
+
+def test_verified_token_cache_expiry_and_eviction():
+    clock = FakeClock()
+    cache = VerifiedTokenCache(maxsize=2, clock=clock)
+    cache.put("a", {"name": "A"}, exp=clock.now + 10)
+    cache.put("b", {"name": "B"}, exp=clock.now + 100)
+    assert cache.get("a") == {"name": "A"}
+
+    cache.put("c", {"name": "C"}, exp=clock.now + 100)  # evicts b, used least recently
+    assert cache.get("b") is None
+    assert cache.evictions == 1
+
+    clock.now += 10
+    assert cache.get("a") is None
+    assert cache.get("c") == {"name": "C"}
+
+    cache.get("c")["name"] = "changed"
+    assert cache.get("c") == {"name": "C"}
+
+    capped = VerifiedTokenCache(max_age=5, clock=clock)
+    capped.put("a", {}, exp=clock.now + 100)
+    clock.now += 5
+    assert capped.get("a") is None
+
+    disabled = VerifiedTokenCache(maxsize=0)
+    disabled.put("a", {}, exp=time.time() + 100)
+    assert disabled.get("a") is None